@@ -1,91 +1,156 @@
-import subprocess
+import functools
 import threading
 import os
+import sys
+from xml.etree import ElementTree
 
-from PySide6.QtCore import QObject, Signal
 from watchdog.observers import Observer
+from watchdog.observers.api import BaseObserver
 from watchdog.events import FileSystemEventHandler
 from datetime import datetime
-from playsound import playsound
-from gtts import gTTS
-from time import sleep
-import xmltodict
+from time import monotonic, time
+
+import astm
+from announcer import ALERT, Announcer
+from audio import AudioEngine
+from backup_index import BackupIndex
+from debounce import Debouncer
+from journal import RECEIVED, CONFIRMED, COMPLETED
+from metrics import METRICS
+from polling import ScandirEmitter
+from rules import Rule, RuleEngine
+from lis import LisDispatcher
+from scheduler import Scheduler
+from signals import Signal
+from tts import PhraseCache
+
+
+def completion_phrase(name):
+    """
+    Cache key and text announced when a sample is completed
+    """
+    last_3 = name[-3:]
+    to_speak = " ".join([c for c in last_3])
+    return last_3, f" {to_speak} 。已完成"
 
 
-def send_result_to_lis():
-    try:
-        _org_dir = os.getcwd()
-        os.chdir(r"c:\automation")
-        subprocess.run([r"AutomationNet.exe"])
-        os.chdir(_org_dir)
-    except Exception as e:
-        print(e)
+def summary_phrase(names):
+    """
+    Cache key and text announced for completions merged into one announcement
+    """
+    return f"summary-{len(names)}", f" {len(names)} 個檢體。已完成"
+
 
+def summary_clip(names):
+    """
+    Audio file of the summary of `names`, or None while it is synthesized
+    """
+    future = Notification.TTS.request(*summary_phrase(names))
+    if future.done() and future.exception() is None:
+        return future.result()
+    return None
 
-class Notification(threading.Thread):
-    LOCK = threading.Lock()
 
-    def __init__(self, name, *, audio_file=None, delay=0, out_folder="audio/out/"):
-        super().__init__()
+class Notification:
+    """
+    A job that notifies after `delay` seconds unless it is stopped first.
+
+    All notifications share one Scheduler, so pending notifications cost
+    a heap entry each instead of a polling thread each.
+    """
+    SCHEDULER = Scheduler()
+    LIS = LisDispatcher()
+    TTS = PhraseCache("audio/out/")
+    AUDIO = AudioEngine()
+    ANNOUNCER = Announcer(AUDIO, summarize=summary_clip)
+    SEND_TO_LIS = True
+
+    def __init__(self, name, *, audio_file=None, delay=0, on_finished=None):
         self._delay = delay
         self._name = name
-        self._event = threading.Event()
-        self._second = 0
         self._sound = audio_file
-        self._out = out_folder
+        self._on_finished = on_finished
+        self._job = None
+        self._claim_lock = threading.Lock()
+        self._claimed = False
+        self._stopped = False
+        self._finished = threading.Event()
 
-        os.makedirs(self._out, exist_ok=True)
+    def start(self):
+        self._job = self.SCHEDULER.schedule(self._delay, self.run)
 
     def run(self):
+        if not self._claim():
+            return
 
-        while True:
-            if self._event.is_set():
-                self.on_stop()
-                break
-
-            self._event.wait(1)
-            if self._second == self._delay:
-                self.on_notify()
-                break
+        if self.SEND_TO_LIS:
+            # announce once the batch containing this result reached LIS,
+            # without holding a worker while the batch window is open
+            self.LIS.submit(self._name, lambda: self.SCHEDULER.submit(self._notify))
+        else:
+            self._notify()
+
+    def _notify(self):
+        try:
+            self.on_notify()
+        finally:
+            self._complete()
+
+    def _claim(self):
+        with self._claim_lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            return True
+
+    def _complete(self):
+        self.on_complete()
+        self._finished.set()
+        if self._on_finished is not None:
+            self._on_finished(self)
 
-            self._second += 1
+    def is_alive(self):
+        return not self._finished.is_set()
 
-        self.on_complete()
+    def join(self, timeout=None):
+        return self._finished.wait(timeout)
 
     def playsound(self):
-        if self._sound is None:
-            return
-
-        playsound(self._sound)
+        return self.AUDIO.play(self._sound)
 
     def say_last_3_char(self):
-        last_3 = self._name[-3:]
-        audio_file = f"{self._out}{last_3}.mp3"
+        return self.AUDIO.play(self.TTS.get(*completion_phrase(self._name)))
 
-        if not os.path.isfile(audio_file):
-            to_speak = " ".join([c for c in last_3])
-            tts = gTTS(f" {to_speak} 。已完成", lang="zh-tw", slow=True)
-            tts.save(audio_file)
+    def stop(self):
+        if not self._claim():
+            return
 
-        playsound(audio_file)
+        if self._job is not None:
+            self.SCHEDULER.cancel(self._job)
 
-    def stop(self):
-        self._event.set()
+        self._stopped = True
+        self.on_stop()
+        self._complete()
 
     def on_stop(self):
         print("Interrupted")
 
     def on_notify(self):
-        is_locked = self.LOCK.locked()
-
-        self.LOCK.acquire()
-        send_result_to_lis()
-
-        if not is_locked:
-            self.playsound()
-
-        self.say_last_3_char()
-        self.LOCK.release()
+        # queue the announcement once the phrase is ready, without holding a
+        # scheduler worker, which alerts need, while it is synthesized
+        requested = monotonic()
+        future = self.TTS.request(*completion_phrase(self._name))
+        future.add_done_callback(lambda f: self._announce(f, requested))
+
+    def _announce(self, future, requested):
+        METRICS.record("tts", monotonic() - requested)
+        try:
+            clip, chime = future.result(), self._sound
+        except Exception as e:
+            print(f"{self._name}: {e}")
+            clip, chime = self._sound, None
+
+        self.ANNOUNCER.announce(self._name, clip, chime=chime)
 
     def on_complete(self):
         print(f"{self._name} is Completed")
@@ -94,17 +159,39 @@ class Notification(threading.Thread):
     def name(self):
         return self._name
 
+    @property
+    def stopped(self):
+        return self._stopped
+
 
 class Alert(Notification):
+    SEND_TO_LIS = False
+
     def on_notify(self):
-        self.playsound()
+        self.ANNOUNCER.announce(self._name, self._sound, priority=ALERT)
 
 
 class ObserveCenter(Observer):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, *, emitter_class=None, timeout=1):
+        if emitter_class is None:
+            super().__init__()
+        else:
+            BaseObserver.__init__(self, emitter_class, timeout=timeout)
         self._start_time = None
 
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Observer using native change notifications, or polling with
+        ScandirEmitter when the `polling` setting is on
+        """
+        if not bool(int(settings.get("polling"))):
+            return cls()
+
+        return cls(emitter_class=functools.partial(ScandirEmitter,
+                                                   min_interval=float(settings.get("poll_interval")),
+                                                   max_interval=float(settings.get("poll_max_interval"))))
+
     def start(self):
         self._start_time = datetime.now()
         super().start()
@@ -120,147 +207,385 @@ class ObserveCenter(Observer):
         return (datetime.now() - self._start_time).seconds
 
 
-class SampleTest:
+ASSAY_SETS = {}
+MAX_ASSAY_SETS = 4096
+
+
+def intern_assays(assays):
+    """
+    Return `assays` as a tuple of interned codes, shared by every sample
+    with the same assays
+    """
+    if isinstance(assays, str):
+        assays = (assays,)
+    key = tuple(assays)
+    shared = ASSAY_SETS.get(key)
+    if shared is None:
+        shared = tuple(sys.intern(code) if isinstance(code, str) else code for code in key)
+        if len(ASSAY_SETS) >= MAX_ASSAY_SETS:
+            ASSAY_SETS.clear()
+        shared = ASSAY_SETS.setdefault(key, shared)
+
+    return shared
+
+
+class Record:
+    """
+    Slotted, immutable base of the sample records
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"{type(self).__name__}{self._key()!r}"
+
+    def _key(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+class SampleTest(Record):
     """
     Store information of samples,
     including sample numbers and assays used in the tests
     """
+    __slots__ = ("sample_id", "assays")
 
-    def __init__(self, sample_number: str, assays: list[str]):
-        self._id = sample_number
-        self._assays = assays
+    def __init__(self, sample_number: str, assays: tuple[str, ...]):
+        object.__setattr__(self, "sample_id", sample_number)
+        object.__setattr__(self, "assays", intern_assays(assays))
+
+    def __reduce__(self):
+        # samples parsed in another process are interned again when unpickled
+        return SampleTest, (self.sample_id, self.assays)
 
     @classmethod
     def read_xml(cls, file):
         res = XmlResult.read_file(file)
         return SampleTest(res.sample_id, res.assays)
 
+    @classmethod
+    def iter_xml(cls, file):
+        for res in XmlResult.iter_file(file):
+            yield SampleTest(res.sample_id, res.assays)
+
     @classmethod
     def read_upl(cls, file):
+        return next(cls.iter_upl(file), SampleTest(None, []))
+
+    @classmethod
+    def iter_upl(cls, file):
+        """
+        Yield a sample for every patient (P) record of an ASTM upload,
+        with the tests of the order (O) records that follow it
+        """
         sample_id, assays = None, []
         with open(file, "r") as f:
-            for line in f.readlines():
-                l = line.split("|")
-                if l[0] == "P":
-                    sample_id = l[3]
+            for record, fields, delimiters in astm.iter_records(f):
+                if record in "PL" and (sample_id is not None or assays):
+                    yield SampleTest(sample_id, assays)
+                    sample_id, assays = None, []
 
-                if l[0] == "O":
-                    assays.append(l[4].strip("^"))
+                if record == "P" and len(fields) > 3:
+                    sample_id = fields[3]
 
-        return SampleTest(sample_id, assays)
+                if record == "O" and len(fields) > 4:
+                    for test in delimiters.repeats(fields[4]):
+                        code = delimiters.component.join(c for c in delimiters.components(test) if c)
+                        if code:
+                            assays.append(code)
 
-    @property
-    def sample_id(self):
-        return self._id
+        if sample_id is not None or assays:
+            yield SampleTest(sample_id, assays)
 
-    @property
-    def assays(self):
-        return self._assays
 
+def iter_samples(reader, file, *, on_error, default_id="unknown"):
+    """
+    Yield the samples read from `file`, or a single placeholder sample
+    if nothing could be read from it
+    """
+    count = 0
+    try:
+        for sample in reader(file):
+            count += 1
+            yield sample
+    except Exception as e:
+        on_error(e)
+
+    if count == 0:
+        yield SampleTest(default_id, [])
 
-class LisFolderHandler(FileSystemEventHandler, QObject):
+
+class LisFolderHandler(FileSystemEventHandler):
     DELETED = Signal(SampleTest)
     ERROR = Signal(str)
 
-    def __init__(self, *, audio_file=None, delay=0):
-        QObject.__init__(self)
+    def __init__(self, *, audio_file=None, delay=0, debouncer=None, journal=None):
         self._audio = audio_file
         self._delay = delay
-        self._last_modified = None
+        self._debouncer = debouncer or Debouncer(Notification.SCHEDULER, quiet=0.5)
+        self._journal = journal
+
+    def configure(self, *, audio_file=None, delay=None):
+        if audio_file is not None:
+            self._audio = audio_file
+        if delay is not None:
+            self._delay = delay
+
+    @property
+    def debouncer(self):
+        return self._debouncer
+
+    def on_created(self, event):
+        # polling observers report new files as created only
+        self.on_modified(event)
 
     def on_modified(self, event):
-        if self._last_modified == event.src_path:
-            return
         if event.is_directory:
             return
 
-        self._last_modified = event.src_path
-
-        print(f"{datetime.now()}: Modified {event.src_path}")
-        _, f_name = os.path.split(event.src_path)
-        _, ext = os.path.splitext(f_name)
-
+        _, ext = os.path.splitext(event.src_path)
         if ext.lower() == ".upl":
-            sample = SampleTest("Unknown", [])
-            try:
-                sample = SampleTest.read_upl(event.src_path)
-            except Exception as e:
-                self.ERROR.emit(e)
-                print(e)
+            received = monotonic()
+            self._debouncer.submit(event.src_path, lambda: self.parse_upload(event.src_path, received))
+
+    def read_upload(self, file, received=None):
+        self.parse_upload(file, received)()
+
+    def parse_upload(self, file, received=None):
+        """
+        Read an upload and return the step completing its samples, which
+        the worker pool runs in event order
+        """
+        if received is not None:
+            METRICS.record("dispatch", monotonic() - received)
+        print(f"{datetime.now()}: Modified {file}")
+
+        with METRICS.stage("parse"):
+            samples = list(iter_samples(SampleTest.iter_upl, file, on_error=self.on_error, default_id="Unknown"))
+
+        def commit():
+            for sample in samples:
+                self.complete_sample(sample)
+
+        return commit
+
+    def complete_sample(self, sample, *, catch_up=False):
+        """
+        Record a completed sample and announce it, unless it is an old
+        completion found by the catch-up scan
+        """
+        METRICS.mark(sample.sample_id, "completed")
+        self.DELETED.emit(sample)
+
+        if self._journal is not None:
+            self._journal.record(sample.sample_id, COMPLETED)
+
+        if catch_up:
+            print(f"{sample.sample_id} is completed (catch-up)")
+            return
 
-            self.DELETED.emit(sample)
+        try:
+            Notification(sample.sample_id, audio_file=self._audio, delay=self._delay).start()
+        except Exception as e:
+            self.ERROR.emit(e)
+            print(f"{sample.sample_id}, {sample.assays}, {e}")
 
-            try:
-                Notification(sample.sample_id, audio_file=self._audio, delay=self._delay).start()
-            except Exception as e:
-                self.ERROR.emit(e)
-                print(f"{sample.sample_id}, {sample.assays}, {e}")
+    def on_error(self, e):
+        self.ERROR.emit(e)
+        print(e)
 
 
-class IhFolderHandler(FileSystemEventHandler, QObject):
+class IhFolderHandler(FileSystemEventHandler):
     RECEIVED = Signal(SampleTest)
     CONFIRMED = Signal(SampleTest)
     ERROR = Signal(str)
 
-    def __init__(self, *, audio_file=None, delay=10):
-        QObject.__init__(self)
+    def __init__(self, *, audio_file=None, delay=10, debouncer=None, journal=None, rules=None):
         self._notifications = {}
+        self._notifications_lock = threading.Lock()
         self._audio = audio_file
-        self._delay = delay
-        self._last_modified = None
+        self._debouncer = debouncer or Debouncer()
+        self._journal = journal
+        self._rules = rules or RuleEngine([Rule("PR15B", sound=audio_file, delay=delay)])
+        self._backup_indexes = {}
+
+    def configure(self, *, audio_file=None):
+        """
+        Sound of alerts whose rule has none; rules are replaced through `rules`
+        """
+        if audio_file is not None:
+            self._audio = audio_file
+
+    @property
+    def debouncer(self):
+        return self._debouncer
+
+    @property
+    def rules(self):
+        return self._rules
+
+    def on_created(self, event):
+        if event.is_directory:
+            return
+
+        if self.is_backup_file(event.src_path):
+            self.backup_index(os.path.dirname(event.src_path)).add(os.path.basename(event.src_path))
+
+    def on_moved(self, event):
+        if event.is_directory:
+            self._backup_indexes.pop(event.src_path, None)
+            return
+
+        if self.is_backup_file(event.src_path):
+            self.backup_index(os.path.dirname(event.src_path)).remove(os.path.basename(event.src_path))
+
+        if self.is_backup_file(event.dest_path):
+            self.backup_index(os.path.dirname(event.dest_path)).add(os.path.basename(event.dest_path))
 
     def on_deleted(self, event):
         if event.is_directory:
+            self._backup_indexes.pop(event.src_path, None)
             return
 
-        print(f"{datetime.now()}: Modified {event.src_path}")
+        if self.is_backup_file(event.src_path):
+            self.backup_index(os.path.dirname(event.src_path)).remove(os.path.basename(event.src_path))
+            return
 
         if not self.is_target_files(event.src_path):
             return
 
-        backup_file = self.get_backup_file(event.src_path)
+        received = monotonic()
+        self._debouncer.submit(event.src_path, lambda: self.parse_result(event.src_path, received))
 
-        sample = SampleTest("unknown", [])
-        _, ext = os.path.splitext(event.src_path)
-        if ext.lower() == ".xml":
-            try:
-                sample = SampleTest.read_xml(backup_file)
-            except Exception as e:
-                self.ERROR.emit(e)
-                print(e)
-            print(datetime.now(), sample.sample_id, sample.assays)
-
-            if sample.sample_id in self.notifications:
-                print(f"{sample.sample_id} has been registered!")
-                return
-
-            self.RECEIVED.emit(sample)
-
-            if "PR15B" in sample.assays:
-                try:
-                    notification = Alert(sample.sample_id, audio_file=self._audio, delay=self._delay)
-                    notification.start()
-                    self.add_notification(sample.sample_id, notification)
-                except Exception as e:
-                    print(e)
-                    self.ERROR.emit(e)
+    def read_result(self, file, received=None):
+        self.parse_result(file, received)()
 
+    def parse_result(self, file, received=None):
+        """
+        Read the backup copy of a result and return the step receiving or
+        confirming its samples, which the worker pool runs in event order
+        """
+        if received is not None:
+            METRICS.record("dispatch", monotonic() - received)
+        print(f"{datetime.now()}: Modified {file}")
+
+        with METRICS.stage("backup lookup"):
+            backup_file = self.get_backup_file(file)
+
+        _, ext = os.path.splitext(file)
+        if ext.lower() == ".xml":
+            reader, step = SampleTest.iter_xml, self.receive_sample
         elif ext.lower() == ".upl":
-            try:
-                sample = SampleTest.read_upl(backup_file)
-            except Exception as e:
-                self.ERROR.emit(e)
-                print(e)
-            print(datetime.now(), sample.sample_id, sample.assays)
+            reader, step = SampleTest.iter_upl, self.confirm_sample
+        else:
+            return lambda: None
+
+        with METRICS.stage("parse"):
+            samples = list(iter_samples(reader, backup_file, on_error=self.on_error))
+
+        def commit():
+            for sample in samples:
+                step(sample)
+
+        return commit
+
+    def receive_sample(self, sample, *, elapsed=0, catch_up=False):
+        """
+        Register a received sample and start its alert. `elapsed` is the time
+        since the result was written, taken off the alert delay, and old
+        results found by the catch-up scan are registered without an alert.
+        """
+        print(datetime.now(), sample.sample_id, sample.assays)
+
+        if sample.sample_id in self.notifications:
+            print(f"{sample.sample_id} has been registered!")
+            return
+
+        METRICS.mark(sample.sample_id, "received")
+        self.RECEIVED.emit(sample)
+
+        if catch_up:
+            print(f"{sample.sample_id} is received (catch-up)")
+            if self._journal is not None:
+                self._journal.record(sample.sample_id, RECEIVED)
+            return
+
+        Notification.TTS.prefetch(*completion_phrase(sample.sample_id))
+
+        rule = self._rules.match(sample.assays)
+        if rule is not None:
+            self.start_alert(sample.sample_id, max(rule.delay - elapsed, 0), rule.sound)
+        elif self._journal is not None:
+            self._journal.record(sample.sample_id, RECEIVED)
+
+    def start_alert(self, sample_id, delay, sound=None):
+        sound = sound or self._audio
+        try:
+            notification = Alert(sample_id, audio_file=sound, delay=delay, on_finished=self.on_alert_finished)
+            if self._journal is not None:
+                self._journal.record(sample_id, RECEIVED, deadline=time() + delay, sound=sound)
+            # registered before it starts, so a short delay can't finish it first
+            self.add_notification(sample_id, notification)
+            notification.start()
+        except Exception as e:
+            print(e)
+            self.ERROR.emit(e)
+
+    def on_alert_finished(self, notification):
+        with self._notifications_lock:
+            if self._notifications.get(notification.name) is notification:
+                del self._notifications[notification.name]
+
+        if self._journal is not None and not notification.stopped:
+            self._journal.record(notification.name, COMPLETED)
+
+    def restore(self):
+        """
+        Restart the alerts that were pending when the journal was last written,
+        with the time they had left and the sound of their rule
+        """
+        if self._journal is None:
+            return
+
+        now = time()
+        for sample_id, (deadline, sound) in self._journal.pending().items():
+            if deadline is None or sample_id in self._notifications:
+                continue
+
+            print(f"{sample_id} is restored")
+            self.start_alert(sample_id, max(deadline - now, 0), sound)
 
-            self.CONFIRMED.emit(sample)
+    def confirm_sample(self, sample):
+        print(datetime.now(), sample.sample_id, sample.assays)
 
-            if sample.sample_id not in self.notifications:
-                print(f"{sample.sample_id} is not registered!")
-                return
+        METRICS.mark(sample.sample_id, "confirmed")
+        self.CONFIRMED.emit(sample)
 
-            if "PR15B" in sample.assays:
-                self.remove_notification(sample.sample_id)
+        if self._journal is not None:
+            self._journal.record(sample.sample_id, CONFIRMED)
+
+        if sample.sample_id not in self.notifications:
+            print(f"{sample.sample_id} is not registered!")
+            return
+
+        rule = self._rules.match(sample.assays)
+        if rule is not None and rule.cancel_on_confirm:
+            self.remove_notification(sample.sample_id)
+
+    def on_error(self, e):
+        self.ERROR.emit(e)
+        print(e)
 
     def is_target_files(self, file):
         dir_folder, f_name = os.path.split(file)
@@ -270,77 +595,150 @@ class IhFolderHandler(FileSystemEventHandler, QObject):
 
         return True
 
+    def is_backup_file(self, file):
+        return os.path.basename(os.path.dirname(file)) == "Backup"
+
     def get_backup_file(self, file):
         dir_folder, f_name = os.path.split(file)
 
-        backup_folder = os.path.join(dir_folder, "Backup")
+        return self.backup_index(os.path.join(dir_folder, "Backup")).lookup(f_name)
 
-        for _f in os.listdir(backup_folder):
-            if f_name in _f:
-                return os.path.join(dir_folder, "Backup", _f)
+    def backup_index(self, backup_folder):
+        index = self._backup_indexes.get(backup_folder)
+        if index is None:
+            index = self._backup_indexes.setdefault(backup_folder, BackupIndex(backup_folder))
+
+        return index
 
     @property
     def notifications(self):
         self.refresh_notifications()
         return self._notifications.keys()
 
+    @property
+    def alert_count(self):
+        """
+        Alerts started and not yet finished or stopped
+        """
+        return len(self._notifications)
+
     def add_notification(self, sample_id: str, notification: Notification):
-        self._notifications[sample_id] = notification
+        with self._notifications_lock:
+            self._notifications[sample_id] = notification
 
     def remove_notification(self, sample_id: str):
-        self._notifications[sample_id].stop()
-        del (self._notifications[sample_id])
+        with self._notifications_lock:
+            notification = self._notifications.pop(sample_id, None)
+        if notification is not None:
+            notification.stop()
+
+    def stop_notifications(self):
+        """
+        Stop every pending alert, leaving them pending in the journal
+        so `restore` can resume them
+        """
+        for sample_id in list(self._notifications):
+            self.remove_notification(sample_id)
 
     def refresh_notifications(self):
-        to_remove = []
-
-        for sample in self._notifications:
-            if not self._notifications[sample].is_alive():
-                to_remove.append(sample)
+        # finished alerts remove themselves; this only catches ones that didn't
+        with self._notifications_lock:
+            to_remove = [sample for sample, notification in self._notifications.items()
+                         if not notification.is_alive()]
 
         for sample in to_remove:
             self.remove_notification(sample)
 
 
-class XmlResult:
+class XmlResult(Record):
     """
     Read results from xml file
     """
+    __slots__ = ("sample_id", "assays")
+    FIELDS = ("SampleBarcode", "AssayCode")
 
     def __init__(self, data=None):
-        self.data = data
+        """
+        Keep the barcode and assay codes of a RESULT node read into `data`
+        """
+        if data is None:
+            sample_id, assays = None, ()
+        else:
+            sample_id, assays = data['SampleBarcode'], data['AssayCode']
+        object.__setattr__(self, "sample_id", sample_id)
+        object.__setattr__(self, "assays", intern_assays(assays))
 
     @classmethod
     def read_file(cls, f_name):
-        with open(f_name, "r") as f:
-            data = xmltodict.parse(f.read())
+        for result in cls.iter_file(f_name):
+            return result
 
-        return XmlResult(data)
+        raise ValueError(f"No result found in {f_name}")
 
-    @property
-    def sample_id(self):
-        return self.data['RESULT']['RESULT']['SampleBarcode']
+    @classmethod
+    def iter_file(cls, f_name, fields=FIELDS):
+        """
+        Yield every RESULT node of the file without building the whole tree.
+        Only `fields` are kept, and reading stops when the caller stops iterating.
+        Files the streaming parser can't read, or whose RESULT nodes lack
+        one of `fields`, are parsed with xmltodict.
+        """
+        count = 0
+        try:
+            for result in cls._iter_stream(f_name, fields):
+                count += 1
+                yield result
+        except (ElementTree.ParseError, KeyError):
+            for result in list(cls._iter_dict(f_name))[count:]:
+                yield result
 
-    @property
-    def assays(self):
-        return [self.data['RESULT']['RESULT']['AssayCode']]
+    @classmethod
+    def _iter_stream(cls, f_name, fields):
+        depth = 0
+        root = None
+        data = {}
+
+        for event, elem in ElementTree.iterparse(f_name, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 1:
+                    root = elem
+                continue
+
+            if depth == 3 and elem.tag in fields:
+                value = elem.text
+                if elem.tag not in data:
+                    data[elem.tag] = value
+                elif isinstance(data[elem.tag], list):
+                    data[elem.tag].append(value)
+                else:
+                    data[elem.tag] = [data[elem.tag], value]
+
+            elif depth == 2:
+                # a missing field raises KeyError, which falls back to xmltodict
+                if elem.tag == "RESULT":
+                    yield XmlResult(data)
+                data = {}
+                root.clear()
+
+            depth -= 1
 
+    @classmethod
+    def _iter_dict(cls, f_name):
+        import xmltodict
 
-if __name__ == "__main__":
-    from settings import Settings
+        with open(f_name, "r") as f:
+            data = xmltodict.parse(f.read())
 
-    settings = Settings("config.ini")
+        results = data['RESULT']['RESULT']
+        if not isinstance(results, list):
+            results = [results]
 
-    observer = ObserveCenter()
-    ih_handler = IhFolderHandler(audio_file=settings.get("alert_sound"), delay=int(10))
-    lis_handler = LisFolderHandler(audio_file=settings.get("complete_sound"))
-    observer.schedule(ih_handler, settings.get("ih_folder"), True)
-    observer.schedule(lis_handler, settings.get("lis_folder"), False)
-    observer.start()
-    try:
-        while True:
-            sleep(1)
-            # print(observer.get_run_time())
+        for result in results:
+            yield XmlResult(result)
+
+
+if __name__ == "__main__":
+    from daemon import main
 
-    except KeyboardInterrupt:
-        observer.stop()
+    main()
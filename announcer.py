@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import threading
+from time import monotonic
+
+from metrics import METRICS
+
+ALERT = 0
+COMPLETION = 1
+
+
+class Announcer:
+    """
+    Play announcements one at a time, alerts before completions.
+
+    An announcement is only handed to the audio engine once the previous one
+    has been played, so an alert queued behind a burst of completions is
+    played next. Completions waiting longer than `max_age` seconds are
+    dropped, and once more than `summary_threshold` completions are waiting
+    they are announced together with the clip returned by `summarize(names)`.
+    `summarize` must not block; while it returns None, the clip isn't ready
+    and the chime is played instead. Alerts are never dropped or merged.
+    The chime is played before the first completion after the announcer
+    was idle.
+    """
+
+    def __init__(self, audio, *, summarize=None, max_age=300.0, summary_threshold=5):
+        self._audio = audio
+        self._summarize = summarize
+        self._max_age = max_age
+        self._summary_threshold = summary_threshold
+        self._heap = []
+        self._seq = itertools.count()
+        self._completions = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._idle = True
+        self.dropped = 0
+        self.merged = 0
+
+    def configure(self, *, max_age=None, summary_threshold=None):
+        with self._cond:
+            if max_age is not None:
+                self._max_age = float(max_age)
+            if summary_threshold is not None:
+                self._summary_threshold = int(summary_threshold)
+
+    def announce(self, name, clip, *, priority=COMPLETION, chime=None):
+        """
+        Queue `clip` and return an event set once it was played, dropped or merged
+        """
+        done = threading.Event()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="announcer", daemon=True)
+                self._thread.start()
+
+            heapq.heappush(self._heap, (priority, next(self._seq), name, clip, chime, monotonic(), done))
+            if priority == COMPLETION:
+                self._completions += 1
+            self._cond.notify()
+
+        return done
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._idle = True
+                    self._cond.wait()
+                batch = self._next()
+                chime = self._idle and bool(batch) and batch[0][0] == COMPLETION
+                if chime:
+                    self._idle = False
+
+            if batch:
+                self._play(batch, chime)
+
+    def _next(self):
+        """
+        Pop what to play next: an alert, a completion, or every waiting completion
+        """
+        entry = heapq.heappop(self._heap)
+        if entry[0] != COMPLETION:
+            return [entry]
+
+        self._completions -= 1
+        now = monotonic()
+        if now - entry[5] > self._max_age:
+            self._drop(entry)
+            return []
+
+        if self._completions < self._summary_threshold or self._summarize is None:
+            return [entry]
+
+        batch = [entry]
+        rest = []
+        for other in self._heap:
+            if other[0] != COMPLETION:
+                rest.append(other)
+            elif now - other[5] > self._max_age:
+                self._drop(other)
+            else:
+                batch.append(other)
+        heapq.heapify(rest)
+        self._heap = rest
+        self._completions = 0
+        return sorted(batch, key=lambda e: e[1])
+
+    def _drop(self, entry):
+        self.dropped += 1
+        print(f"{entry[2]} was not announced, waited {monotonic() - entry[5]:.0f}s")
+        entry[6].set()
+
+    def _play(self, batch, chime):
+        priority, _, name, clip, chime_clip, queued, _ = batch[0]
+        METRICS.record("announce wait", monotonic() - queued)
+
+        if len(batch) > 1:
+            self.merged += len(batch)
+            try:
+                summary = self._summarize([e[2] for e in batch])
+            except Exception as e:
+                print(e)
+                summary = None
+            if summary is not None:
+                clip = summary
+            elif chime_clip:
+                clip, chime = chime_clip, False
+
+        for entry in batch:
+            METRICS.mark(entry[2], "alerted" if priority == ALERT else "announced")
+
+        if chime:
+            self._audio.play(chime_clip)
+        self._audio.play(clip).wait()
+
+        for entry in batch:
+            entry[6].set()
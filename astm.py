@@ -0,0 +1,48 @@
+RECORD_TYPES = "HPORCMQLS"
+
+
+class Delimiters:
+    """
+    Field, repeat, component and escape delimiters declared by an H record
+    """
+
+    __slots__ = ("field", "repeat", "component", "escape")
+
+    def __init__(self, field="|", repeat="\\", component="^", escape="&"):
+        self.field = field
+        self.repeat = repeat
+        self.component = component
+        self.escape = escape
+
+    @classmethod
+    def from_header(cls, line):
+        # H|\^&|... : the four characters after the record type are the delimiters
+        return Delimiters(*line[1:5])
+
+    def repeats(self, value):
+        return value.split(self.repeat)
+
+    def components(self, value):
+        return value.split(self.component)
+
+
+def iter_records(lines):
+    """
+    Yield (record type, fields, delimiters) for every record of an ASTM
+    E1394 message, one line at a time. Frame numbers in front of the
+    record type are skipped and the delimiters follow the last H record.
+    """
+    delimiters = Delimiters()
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if len(line) > 1 and line[0].isdigit() and line[1] in RECORD_TYPES:
+            line = line[1:]
+
+        if not line:
+            continue
+
+        if line[0] == "H" and len(line) >= 5:
+            delimiters = Delimiters.from_header(line)
+
+        yield line[0], line.split(delimiters.field), delimiters
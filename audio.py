@@ -0,0 +1,189 @@
+import os
+import queue
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from time import monotonic, sleep
+
+from metrics import METRICS
+
+
+class PlaysoundSink:
+    """
+    Play files with playsound. The file has to be decoded on every play.
+    """
+
+    def load(self, file):
+        return file
+
+    def play(self, clip):
+        from playsound import playsound
+
+        playsound(clip)
+
+
+class PcmSink:
+    """
+    Decode clips to PCM once with pydub and play them from memory with
+    simpleaudio. A file pydub can't decode is played with playsound.
+    """
+
+    def __init__(self):
+        import simpleaudio
+        from pydub import AudioSegment
+
+        self._simpleaudio = simpleaudio
+        self._segment = AudioSegment
+
+    def load(self, file):
+        try:
+            segment = self._segment.from_file(file)
+        except Exception as e:
+            print(f"{file} is not cached ({e}); playsound decodes it on every play")
+            return file
+        return segment.raw_data, segment.channels, segment.sample_width, segment.frame_rate
+
+    def play(self, clip):
+        if isinstance(clip, str):
+            PlaysoundSink().play(clip)
+            return
+        self._simpleaudio.play_buffer(*clip).wait_done()
+
+
+class NullSink:
+    """
+    Record what would have been played, taking `duration` seconds per clip
+    """
+
+    def __init__(self, *, duration=0.0):
+        self._duration = duration
+        self.played = []
+
+    def load(self, file):
+        return file
+
+    def play(self, clip):
+        self.played.append((monotonic(), clip))
+        if self._duration:
+            sleep(self._duration)
+
+
+class FileSink(NullSink):
+    """
+    Append a line per played clip to a text file
+    """
+
+    def __init__(self, f_name, *, duration=0.0):
+        super().__init__(duration=duration)
+        self._f_name = f_name
+
+    def play(self, clip):
+        with open(self._f_name, "a") as f:
+            f.write(f"{datetime.now().isoformat()} {clip}\n")
+        super().play(clip)
+
+
+def default_sink():
+    try:
+        sink = PcmSink()
+    except ImportError as e:
+        reason = e
+    else:
+        # pydub imports without ffmpeg, but then can't decode mp3 files
+        if shutil.which("ffmpeg") or shutil.which("avconv"):
+            return sink
+        reason = "ffmpeg is not on the PATH"
+
+    print(f"Audio clips are not cached ({reason}); playsound decodes every clip. "
+          f"Install pydub and simpleaudio, and ffmpeg, to cache them.")
+    return PlaysoundSink()
+
+
+class AudioEngine:
+    """
+    Play clips one after another on a dedicated thread.
+
+    Clips are loaded through the sink once and the `max_clips` most recently
+    played are kept in memory, so playing the same file again skips reading
+    and decoding it. Callers only queue the clip and are not blocked while
+    it plays.
+    """
+
+    def __init__(self, sink=None, *, max_clips=64):
+        self._sink = sink
+        self._max_clips = max_clips
+        self._clips = OrderedDict()
+        self._clips_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def set_sink(self, sink):
+        with self._clips_lock:
+            self._sink = sink
+            self._clips = OrderedDict()
+
+    def preload(self, *files):
+        for f in files:
+            if f:
+                try:
+                    self._load(f)
+                except Exception as e:
+                    print(e)
+
+    def play(self, file):
+        """
+        Queue `file` to be played and return an event set once it has been played
+        """
+        done = threading.Event()
+        if not file:
+            done.set()
+            return done
+
+        self._ensure_started()
+        self._queue.put((file, done, monotonic()))
+        return done
+
+    def busy(self):
+        return self._queue.unfinished_tasks > 0
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audio", daemon=True)
+                self._thread.start()
+
+    def _load(self, file):
+        key = (os.path.abspath(file), os.path.getmtime(file))
+
+        with self._clips_lock:
+            if self._sink is None:
+                self._sink = default_sink()
+            sink = self._sink
+            clip = self._clips.get(key)
+            if clip is not None:
+                self._clips.move_to_end(key)
+
+        if clip is None:
+            clip = sink.load(file)
+            with self._clips_lock:
+                self._clips[key] = clip
+                while len(self._clips) > self._max_clips:
+                    self._clips.popitem(last=False)
+
+        return sink, clip
+
+    def _run(self):
+        while True:
+            file, done, queued = self._queue.get()
+            METRICS.record("audio queue", monotonic() - queued)
+            try:
+                sink, clip = self._load(file)
+                with METRICS.stage("play"):
+                    sink.play(clip)
+            except Exception as e:
+                print(e)
+            finally:
+                done.set()
+                self._queue.task_done()
@@ -0,0 +1,116 @@
+import os
+import threading
+
+SEPARATORS = "_- "
+
+
+def name_keys(name):
+    """
+    Parts of a backup file name that a result file name can match: the
+    whole name and every suffix starting after a separator. Each is a
+    substring of the name, as the result file name has to be.
+    """
+    keys = {name}
+
+    for i, c in enumerate(name):
+        if c in SEPARATORS:
+            keys.add(name[i + 1:])
+
+    keys.discard("")
+    return keys
+
+
+class BackupIndex:
+    """
+    In-memory index of the file names in a Backup folder.
+
+    A result file name is looked up in a dict of name parts, so finding its
+    backup copy does not list the folder. The index is kept up to date with
+    `add`/`remove` from file system events and only rescanned on first use
+    or when a lookup misses and the folder changed since the last scan.
+    """
+
+    def __init__(self, folder):
+        self._folder = folder
+        self._lock = threading.Lock()
+        self._names = set()
+        self._keys = {}
+        self._scan_mtime = None
+
+    @property
+    def folder(self):
+        return self._folder
+
+    def __len__(self):
+        return len(self._names)
+
+    def rescan(self):
+        try:
+            mtime = os.path.getmtime(self._folder)
+            names = os.listdir(self._folder)
+        except OSError:
+            mtime, names = None, []
+
+        with self._lock:
+            self._names = set()
+            self._keys = {}
+            self._scan_mtime = mtime
+            for name in names:
+                self._add(name)
+
+    def add(self, name):
+        with self._lock:
+            if self._scan_mtime is not None:
+                self._add(name)
+
+    def remove(self, name):
+        with self._lock:
+            if name not in self._names:
+                return
+
+            self._names.discard(name)
+            for key in name_keys(name):
+                if self._keys.get(key) == name:
+                    del self._keys[key]
+
+    def lookup(self, f_name):
+        """
+        Return the path of the backup copy of result file `f_name`, or None
+        """
+        if self._scan_mtime is None:
+            self.rescan()
+
+        name = self._find(f_name)
+        if name is None and self._changed():
+            self.rescan()
+            name = self._find(f_name)
+
+        if name is None:
+            return None
+
+        return os.path.join(self._folder, name)
+
+    def _add(self, name):
+        self._names.add(name)
+        for key in name_keys(name):
+            self._keys[key] = name
+
+    def _find(self, f_name):
+        with self._lock:
+            name = self._keys.get(f_name)
+            if name in self._names:
+                return name
+
+            # names that only contain f_name in the middle of a part
+            for name in self._names:
+                if f_name in name:
+                    self._keys[f_name] = name
+                    return name
+
+        return None
+
+    def _changed(self):
+        try:
+            return os.path.getmtime(self._folder) != self._scan_mtime
+        except OSError:
+            return False
@@ -0,0 +1,62 @@
+"""
+Latency of finding the backup copy of a result file, listing the Backup
+folder on every lookup versus the in-memory BackupIndex.
+
+    python benchmarks/bench_backup_index.py [sizes...]
+"""
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backup_index import BackupIndex
+
+
+def listdir_lookup(folder, f_name):
+    for _f in os.listdir(folder):
+        if f_name in _f:
+            return os.path.join(folder, _f)
+
+
+def make_backup_folder(root, count):
+    folder = os.path.join(root, f"Backup{count}")
+    os.makedirs(folder)
+    names = []
+    for i in range(count):
+        name = f"R{i:06d}.xml"
+        open(os.path.join(folder, f"20240601_{i:06d}_{name}"), "w").close()
+        names.append(name)
+
+    return folder, names
+
+
+def timed(fn, names, repeat):
+    start = perf_counter()
+    for name in names[:repeat]:
+        assert fn(name) is not None
+    return (perf_counter() - start) / repeat
+
+
+def main(sizes=(1000, 10000, 100000)):
+    with tempfile.TemporaryDirectory() as root:
+        for count in sizes:
+            folder, names = make_backup_folder(root, count)
+            random.shuffle(names)
+
+            scan = timed(lambda n: listdir_lookup(folder, n), names, max(1, min(200, 2000000 // count)))
+
+            index = BackupIndex(folder)
+            start = perf_counter()
+            index.rescan()
+            build = perf_counter() - start
+            indexed = timed(index.lookup, names, len(names))
+
+            print(f"{count:>7} files: listdir {scan * 1e3:9.3f} ms/lookup, "
+                  f"index {indexed * 1e6:7.3f} us/lookup (initial scan {build * 1e3:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or (1000, 10000, 100000))
@@ -0,0 +1,85 @@
+"""
+Throughput of the startup catch-up scan over a backlog of files written
+while IH-Alert was stopped: result and confirmation backups in
+Results/Backup and uploads in the LIS folder. The files are old enough
+to be passed as catch-up, so nothing is announced.
+
+    python benchmarks/bench_catchup.py --files 20000 --workers 1 4 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+from time import perf_counter, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import alert
+from catchup import CatchUp
+
+
+def result_xml(sample_id, assay):
+    return (f'<?xml version="1.0" encoding="UTF-8"?><RESULT><RESULT><SampleBarcode>{sample_id}</SampleBarcode>'
+            f'<AssayCode>{assay}</AssayCode><Operator>bench</Operator></RESULT></RESULT>')
+
+
+def upload(sample_id, assay):
+    return f"H|\\^&|||IH-COM\nP|1||{sample_id}\nO|1|{sample_id}||^^^{assay}\nL|1|N\n"
+
+
+def make_backlog(root, count):
+    backup = os.path.join(root, "ih", "Results", "Backup")
+    lis = os.path.join(root, "lis")
+    os.makedirs(backup)
+    os.makedirs(lis)
+
+    start = time() - 24 * 3600
+    for i in range(count):
+        sample_id = f"C{i:07d}"
+        kind = i % 3
+        if kind == 0:
+            path, content = os.path.join(backup, f"bench_{sample_id}.xml"), result_xml(sample_id, "PR15B")
+        elif kind == 1:
+            path, content = os.path.join(backup, f"bench_{sample_id}.upl"), upload(sample_id, "PR15B")
+        else:
+            path, content = os.path.join(lis, f"{sample_id}.upl"), upload(sample_id, "ABO")
+        with open(path, "w") as f:
+            f.write(content)
+        os.utime(path, (start + i, start + i))
+
+    return os.path.join(root, "ih"), lis
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--processes", action="store_true", help="parse on processes instead of threads")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="ih-catchup-")
+    try:
+        ih_folder, lis_folder = make_backlog(root, args.files)
+        pool = "processes" if args.processes else "threads"
+
+        for workers in args.workers:
+            ih_handler = alert.IhFolderHandler(delay=0)
+            lis_handler = alert.LisFolderHandler(delay=0)
+            catch_up = CatchUp(ih_folder, lis_folder, workers=workers, processes=args.processes, max_age=60)
+
+            start = perf_counter()
+            # the handlers log every sample
+            with contextlib.redirect_stdout(io.StringIO()):
+                count = catch_up.run(ih_handler, lis_handler, 0, time())
+            elapsed = perf_counter() - start
+
+            print(f"{workers} {pool:<9} {count} files in {elapsed:6.2f}s  {count / elapsed:8.0f} files/s")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Time to hand completions to LIS, running the transmitter once per batch
+(benchmarks/stub_lis.py) compared with a resident bridge
+(benchmarks/fake_lis_bridge.py). Every completion is its own batch, and
+--startup adds the start-up time of the real transmitter to each run of
+the stub but only once to the bridge. --hang-every and --crash-every make
+the bridge misbehave, to load-test the timeout and restart paths.
+
+    python benchmarks/bench_lis.py --batches 200 --startup 0.3 --timeout 2
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lis import LisDispatcher
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run(dispatcher, count):
+    latencies = []
+    for i in range(count):
+        start = perf_counter()
+        dispatcher.submit(f"S{i:06d}").wait_done()
+        latencies.append(perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--transmit", type=float, default=0.0, help="seconds taken by each transmit")
+    parser.add_argument("--startup", type=float, default=0.3, help="seconds taken to start the transmitter")
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--hang-every", type=int, default=0)
+    parser.add_argument("--crash-every", type=int, default=0)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="ih-lis-")
+    python = f'"{sys.executable}"'
+    command = (f'{python} "{os.path.join(HERE, "stub_lis.py")}" --log "{os.path.join(root, "stub.log")}" '
+               f'--delay {args.startup + args.transmit}')
+    bridge = (f'{python} "{os.path.join(HERE, "fake_lis_bridge.py")}" --log "{os.path.join(root, "bridge.log")}" '
+              f'--delay {args.transmit} --startup {args.startup} '
+              f'--hang-every {args.hang_every} --crash-every {args.crash_every}')
+
+    try:
+        for mode, options in (("command", {}), ("bridge", {"bridge": bridge})):
+            dispatcher = LisDispatcher(command=command, workdir=root, window=0, timeout=args.timeout, **options)
+            start = perf_counter()
+            # the dispatcher logs every batch
+            with contextlib.redirect_stdout(io.StringIO()):
+                latencies = sorted(run(dispatcher, args.batches))
+            elapsed = perf_counter() - start
+            p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+            print(f"{mode:<8} {args.batches} batches in {elapsed:6.2f}s  "
+                  f"median {statistics.median(latencies) * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms")
+            if dispatcher.bridge is not None:
+                print(f"         bridge started {dispatcher.bridge.starts} times, "
+                      f"{dispatcher.bridge.timeouts} timeouts")
+            dispatcher.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Memory used by samples: the size of one SampleTest compared with a plain
+class holding a list, and the resident set size while 100k simulated
+samples pass through a bounded SampleHistory.
+
+    python benchmarks/bench_memory.py --samples 100000 --history 1000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alert import SampleTest
+from history import SampleHistory
+
+PANELS = [["ABO", "RH"], ["ABO", "RH", "PR15B"], ["DAT"], ["ABO", "RH", "AB SCR"], ["PR15B"]]
+
+
+class PlainSample:
+    def __init__(self, sample_number, assays):
+        self._id = sample_number
+        self._assays = assays
+
+
+def rss():
+    """
+    Resident set size in MB, or None when it can't be read
+    """
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    return None
+
+
+def footprint(cls, count):
+    """
+    Bytes allocated per retained sample, including its assay list or tuple
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    # copy the panels as a parser would build a new list for every file
+    samples = [cls(f"S{i:08d}", list(random.choice(PANELS))) for i in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del samples
+    return size / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=100_000)
+    parser.add_argument("--history", type=int, default=1000, help="samples kept by the history")
+    args = parser.parse_args()
+
+    for cls in (PlainSample, SampleTest):
+        print(f"{cls.__name__:<12} {footprint(cls, 10_000):8.1f} bytes per sample")
+
+    history = SampleHistory(max_entries=args.history)
+    start = rss()
+    step = max(args.samples // 10, 1)
+    for i in range(args.samples):
+        history.add(SampleTest(f"S{i:08d}", list(random.choice(PANELS))), "RECEIVED")
+        if (i + 1) % step == 0:
+            gc.collect()
+            current = rss()
+            growth = "n/a" if current is None else f"{current:.1f} MB ({current - start:+.1f})"
+            print(f"{i + 1:>8} samples  history {len(history):>6}  rss {growth}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Cost of one polling scan of a large folder tree: ScandirEmitter against
+watchdog's DirectorySnapshot used by its generic PollingObserver.
+
+    python benchmarks/bench_polling.py [files] [dirs]
+"""
+import os
+import queue
+import sys
+import tempfile
+from time import perf_counter
+
+from watchdog.observers.api import ObservedWatch
+from watchdog.utils.dirsnapshot import DirectorySnapshot
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from polling import ScandirEmitter
+
+
+def make_tree(root, files, dirs):
+    for d in range(dirs):
+        folder = os.path.join(root, f"d{d:03d}")
+        os.makedirs(folder)
+        for f in range(files // dirs):
+            open(os.path.join(folder, f"R{f:06d}.xml"), "w").close()
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e3
+
+
+def main(files=50000, dirs=50):
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root, files, dirs)
+
+        emitter = ScandirEmitter(queue.Queue(), ObservedWatch(root, True))
+        emitter.on_thread_start()
+
+        snapshot = timed(lambda: DirectorySnapshot(root, True))
+        full = timed(lambda: emitter.scan(full=True))
+        idle = timed(lambda: emitter.scan())
+
+        counter = iter(range(1000))
+
+        def one_new_file():
+            open(os.path.join(root, "d000", f"new{next(counter)}.xml"), "w").close()
+            emitter.scan()
+
+        changed = timed(one_new_file)
+
+        print(f"{files} files in {dirs} folders, best of 3 scans")
+        print(f"  watchdog DirectorySnapshot:        {snapshot:9.2f} ms")
+        print(f"  ScandirEmitter full scan:          {full:9.2f} ms")
+        print(f"  ScandirEmitter idle scan:          {idle:9.2f} ms")
+        print(f"  ScandirEmitter one folder changed: {changed:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,96 @@
+"""
+Thread count and CPU time for a burst of 1,000 pending notifications,
+comparing one polling thread per sample with the shared Scheduler.
+
+    python benchmarks/bench_scheduler.py [count] [delay]
+"""
+import os
+import sys
+import threading
+from time import perf_counter, process_time, sleep
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alert import Notification
+
+
+class SilentNotification(Notification):
+    SEND_TO_LIS = False
+
+    def on_notify(self):
+        pass
+
+    def on_complete(self):
+        pass
+
+
+class PollingNotification(threading.Thread):
+    """The previous thread-per-sample implementation"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self._delay = delay
+        self._event = threading.Event()
+        self._second = 0
+
+    def run(self):
+        while not self._event.is_set():
+            self._event.wait(1)
+            if self._second == self._delay:
+                break
+            self._second += 1
+
+
+def measure(label, start_all, join_all):
+    base_threads = threading.active_count()
+    peak = base_threads
+    sampling = threading.Event()
+
+    # sample while the jobs are pending and while they fire, when the
+    # scheduler's workers are running
+    def sample_threads():
+        nonlocal peak
+        while not sampling.wait(0.01):
+            peak = max(peak, threading.active_count() - 1)
+
+    sampler = threading.Thread(target=sample_threads, daemon=True)
+    sampler.start()
+    cpu, wall = process_time(), perf_counter()
+
+    jobs = start_all()
+    join_all(jobs)
+    # the last jobs may fire between two samples; idle workers are still there
+    peak = max(peak, threading.active_count() - 1)
+    sampling.set()
+    sampler.join()
+
+    print(f"{label:>10}: peak threads {peak - base_threads:5d}, "
+          f"cpu {process_time() - cpu:6.3f}s, wall {perf_counter() - wall:6.3f}s")
+
+
+def main(count=1000, delay=3):
+    def start_polling():
+        jobs = [PollingNotification(delay) for _ in range(count)]
+        for j in jobs:
+            j.start()
+        sleep(delay / 2)
+        return jobs
+
+    def start_scheduled():
+        jobs = [SilentNotification("bench", delay=delay) for _ in range(count)]
+        for j in jobs:
+            j.start()
+        sleep(delay / 2)
+        return jobs
+
+    def join_all(jobs):
+        for j in jobs:
+            j.join()
+
+    print(f"{count} notifications, {delay}s delay")
+    measure("polling", start_polling, join_all)
+    measure("scheduler", start_scheduled, join_all)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,89 @@
+"""
+Cold start time of the GUI: importing main, and from there until the main
+window is first painted. Every run is a fresh interpreter started in an
+empty working folder, so the folders watched are the defaults.
+
+    python forms.py
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --loadui     # ignore the compiled forms
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys
+from time import perf_counter
+start = perf_counter()
+sys.path.insert(0, sys.argv[1])
+
+import main
+imported = perf_counter()
+
+import forms
+if sys.argv[2] == "1":
+    forms.compiled_form = lambda ui_file: None
+compiled = forms.compiled_form("mainWindow.ui") is not None
+
+from PySide6 import QtWidgets
+from PySide6.QtCore import QEvent, QObject
+
+app = QtWidgets.QApplication(sys.argv[:1])
+painted = None
+
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        global painted
+        if event.type() == QEvent.Paint and painted is None:
+            painted = perf_counter()
+            app.quit()
+        return False
+
+
+window = main.MainWindow()
+window.installEventFilter(FirstPaint(window))
+window.show()
+app.exec()
+window.close()
+print(json.dumps({"import": imported - start, "paint": painted - imported, "compiled": compiled}))
+"""
+
+
+def run_once(loadui):
+    folder = tempfile.mkdtemp(prefix="ih-startup-")
+    try:
+        for ui_file in glob.glob(os.path.join(ROOT, "*.ui")):
+            shutil.copy(ui_file, folder)
+        out = subprocess.run([sys.executable, "-c", CHILD, ROOT, "1" if loadui else "0"],
+                             cwd=folder, capture_output=True, text=True, check=True).stdout
+        return json.loads(out.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--loadui", action="store_true", help="load the .ui files at runtime")
+    args = parser.parse_args()
+
+    runs = [run_once(args.loadui) for _ in range(args.runs)]
+    forms = "compiled forms" if runs[0]["compiled"] and not args.loadui else "uic.loadUi"
+    print(f"{args.runs} runs with {forms}")
+    for key in ("import", "paint"):
+        values = [r[key] * 1e3 for r in runs]
+        print(f"{key:<8} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms   "
+              f"max {max(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
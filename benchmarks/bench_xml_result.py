@@ -0,0 +1,65 @@
+"""
+Parse time of IH-COM result files, xmltodict on the whole document versus
+the streaming XmlResult parser.
+
+    python benchmarks/bench_xml_result.py
+"""
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+import xmltodict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alert import XmlResult
+
+
+def result_xml(sample_id, wells=20, results=1):
+    nodes = []
+    for r in range(results):
+        well_data = "".join(f"<Well><Index>{w}</Index><Reaction>{w % 5}</Reaction><Image>{'A' * 200}</Image></Well>"
+                            for w in range(wells))
+        nodes.append(f"<RESULT><SampleBarcode>{sample_id}{r:03d}</SampleBarcode><AssayCode>PR15B</AssayCode>"
+                     f"<Operator>lab</Operator><Wells>{well_data}</Wells></RESULT>")
+
+    return f'<?xml version="1.0" encoding="UTF-8"?><RESULT>{"".join(nodes)}</RESULT>'
+
+
+def read_xmltodict(f_name):
+    with open(f_name, "r") as f:
+        data = xmltodict.parse(f.read())
+    result = data['RESULT']['RESULT']
+    if isinstance(result, list):
+        result = result[0]
+    return result['SampleBarcode'], result['AssayCode']
+
+
+def timed(fn, repeat):
+    start = perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    cases = [("small", 20, 1, 500), ("large", 2000, 1, 20), ("multi", 200, 50, 10)]
+
+    with tempfile.TemporaryDirectory() as root:
+        for label, wells, results, repeat in cases:
+            f_name = os.path.join(root, f"{label}.xml")
+            with open(f_name, "w") as f:
+                f.write(result_xml("S24", wells, results))
+            size = os.path.getsize(f_name) / 1024
+
+            old = timed(lambda: read_xmltodict(f_name), repeat)
+            first = timed(lambda: XmlResult.read_file(f_name).sample_id, repeat)
+            every = timed(lambda: [r.sample_id for r in XmlResult.iter_file(f_name)], repeat)
+
+            print(f"{label:>6} ({size:8.1f} KiB, {results:2d} results): xmltodict {old:8.3f} ms, "
+                  f"streaming first {first:8.3f} ms, streaming all {every:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
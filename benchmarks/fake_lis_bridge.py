@@ -0,0 +1,46 @@
+"""
+Stand-in for a resident LIS transmitter speaking the LisBridge protocol:
+one JSON request per line on stdin, one JSON reply per line on stdout.
+Each transmit sleeps like a transmitter run and appends one line to a log
+file. --hang-every and --crash-every make it stop answering or exit, to
+check the timeout and restart paths.
+
+    lis_bridge = python benchmarks/fake_lis_bridge.py --log lis_runs.txt --delay 0.05
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from time import sleep
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default="fake_lis_bridge.log")
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds taken by each transmit")
+    parser.add_argument("--startup", type=float, default=0.0, help="seconds taken to start")
+    parser.add_argument("--hang-every", type=int, default=0, help="stop answering on every n-th transmit")
+    parser.add_argument("--crash-every", type=int, default=0, help="exit on every n-th transmit")
+    args = parser.parse_args()
+
+    sleep(args.startup)
+    transmits = 0
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get("op") == "transmit":
+            transmits += 1
+            if args.crash_every and transmits % args.crash_every == 0:
+                sys.exit(3)
+            if args.hang_every and transmits % args.hang_every == 0:
+                while True:
+                    sleep(3600)
+
+            sleep(args.delay)
+            with open(args.log, "a") as f:
+                f.write(f"{datetime.now().isoformat()} {' '.join(request.get('samples', []))}\n")
+
+        print(json.dumps({"id": request.get("id"), "ok": True}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+End-to-end latency of the alert pipeline, replaying result files into a
+synthetic IH-COM folder tree watched by ObserveCenter.
+
+Results, their Backup copies and LIS uploads are written into a temporary
+folder following a synthetic or recorded schedule. The LIS transmitter is
+replaced by benchmarks/stub_lis.py, speech by a fake engine and the audio
+output by a recording sink, so the replay runs headless. The report gives
+percentiles of the time between a LIS upload landing and its announcement
+being played, and the peak thread count. Completions merged into one
+summary announcement count as announced when the summary is played.
+
+    python benchmarks/replay.py --samples 200 --rate 20
+    python benchmarks/replay.py --schedule arrivals.csv
+
+A recorded schedule has one "offset_seconds,kind,sample_id" line per file,
+where kind is "result" (XML in Results), "confirm" (UPL in Results) or
+"lis" (UPL in the LIS folder).
+"""
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from time import monotonic, sleep
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import alert
+from announcer import Announcer
+from audio import NullSink
+from tts import PhraseCache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class FakeSpeech:
+    def save(self, text, file):
+        with open(file, "w") as f:
+            f.write(text)
+
+
+class RecordingAnnouncer(Announcer):
+    """
+    Announcer remembering when the announcement of each sample was played
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.played = {}
+
+    def _play(self, batch, chime):
+        super()._play(batch, chime)
+        now = monotonic()
+        for entry in batch:
+            self.played.setdefault(entry[2], now)
+
+
+def result_xml(sample_id, assay):
+    return (f'<?xml version="1.0" encoding="UTF-8"?><RESULT><RESULT><SampleBarcode>{sample_id}</SampleBarcode>'
+            f'<AssayCode>{assay}</AssayCode><Operator>replay</Operator></RESULT></RESULT>')
+
+
+def upload(sample_id, assay):
+    return f"H|\\^&|||IH-COM\nP|1||{sample_id}\nO|1|{sample_id}||^^^{assay}\nL|1|N\n"
+
+
+def synthetic_schedule(samples, rate, alert_ratio=0.2):
+    schedule = []
+    for i in range(samples):
+        sample_id = f"R{i:06d}"
+        offset = i / rate
+        schedule.append((offset, "result", sample_id))
+        schedule.append((offset + 0.2, "confirm", sample_id))
+        schedule.append((offset + 0.4, "lis", sample_id))
+    alerts = int(samples * alert_ratio)
+    return sorted(schedule), alerts
+
+
+def read_schedule(f_name):
+    with open(f_name, newline="") as f:
+        return sorted((float(offset), kind, sample_id) for offset, kind, sample_id in csv.reader(f)), 0
+
+
+class Tree:
+    def __init__(self, root):
+        self.results = os.path.join(root, "ih", "Results")
+        self.backup = os.path.join(self.results, "Backup")
+        self.lis = os.path.join(root, "lis")
+        os.makedirs(self.backup)
+        os.makedirs(self.lis)
+
+    def write(self, kind, sample_id, assay):
+        if kind == "lis":
+            with open(os.path.join(self.lis, f"{sample_id}.upl"), "w") as f:
+                f.write(upload(sample_id, assay))
+            return
+
+        f_name = f"{sample_id}.xml" if kind == "result" else f"{sample_id}.upl"
+        content = result_xml(sample_id, assay) if kind == "result" else upload(sample_id, assay)
+        with open(os.path.join(self.backup, f"replay_{f_name}"), "w") as f:
+            f.write(content)
+
+        # IH-COM removes the result file once it has been picked up
+        path = os.path.join(self.results, f_name)
+        with open(path, "w") as f:
+            f.write(content)
+        os.remove(path)
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=10, help="samples per second")
+    parser.add_argument("--schedule", help="csv file with a recorded arrival schedule")
+    parser.add_argument("--lis-window", type=float, default=0.5)
+    parser.add_argument("--transmit", type=float, default=0.2, help="seconds taken by the stub transmitter")
+    parser.add_argument("--quiet", type=float, default=0.2, help="debounce quiet period of LIS events")
+    parser.add_argument("--play", type=float, default=0.0, help="seconds taken to play each clip")
+    parser.add_argument("--summary", type=int, default=5, help="waiting completions merged into one announcement")
+    args = parser.parse_args()
+
+    schedule, alerts = read_schedule(args.schedule) if args.schedule else synthetic_schedule(args.samples, args.rate)
+    alert_ids = {sample_id for _, kind, sample_id in schedule if kind == "result"}
+    alert_ids = set(sorted(alert_ids)[:alerts])
+
+    root = tempfile.mkdtemp(prefix="ih-replay-")
+    try:
+        tree = Tree(root)
+        sink = NullSink(duration=args.play)
+        alert.Notification.AUDIO.set_sink(sink)
+        alert.Notification.TTS = PhraseCache(os.path.join(root, "out"), engine=FakeSpeech())
+        announcer = RecordingAnnouncer(alert.Notification.AUDIO, summarize=alert.Notification.ANNOUNCER._summarize,
+                                       summary_threshold=args.summary)
+        alert.Notification.ANNOUNCER = announcer
+        alert.Notification.LIS.configure(
+            command=f'"{sys.executable}" "{os.path.join(HERE, "stub_lis.py")}" '
+                    f'--log "{os.path.join(root, "lis.log")}" --delay {args.transmit}',
+            workdir=root, window=args.lis_window)
+
+        observer = alert.ObserveCenter()
+        lis_handler = alert.LisFolderHandler(
+            delay=0, debouncer=alert.Debouncer(alert.Notification.SCHEDULER, quiet=args.quiet))
+        ih_handler = alert.IhFolderHandler(audio_file=os.path.join(HERE, os.pardir, "audio", "alert.mp3"), delay=0)
+        observer.schedule(lis_handler, tree.lis, False)
+        observer.schedule(ih_handler, os.path.dirname(tree.results), True)
+        observer.start()
+
+        peak_threads = threading.active_count()
+        sampling = True
+
+        def sample_threads():
+            nonlocal peak_threads
+            while sampling:
+                peak_threads = max(peak_threads, threading.active_count())
+                sleep(0.01)
+
+        sampler = threading.Thread(target=sample_threads, daemon=True)
+        sampler.start()
+
+        landed = {}
+        start = monotonic()
+        for offset, kind, sample_id in schedule:
+            wait = start + offset - monotonic()
+            if wait > 0:
+                sleep(wait)
+
+            assay = "PR15B" if sample_id in alert_ids and kind == "result" else "ABO"
+            if kind == "lis":
+                landed[sample_id] = monotonic()
+            tree.write(kind, sample_id, assay)
+
+        deadline = monotonic() + 30
+        while monotonic() < deadline:
+            if set(landed) <= set(announcer.played):
+                break
+            sleep(0.1)
+
+        sampling = False
+        observer.stop()
+        observer.join()
+
+        announced = announcer.played
+        latencies = [announced[key] - landed_at for key, landed_at in landed.items() if key in announced]
+        missing = len(landed) - len(latencies)
+        batches = list(alert.Notification.LIS.batches)
+
+        print(f"{len(landed)} LIS uploads, {len(alert_ids)} alerts, {len(batches)} LIS batches, {missing} not announced")
+        print(f"event to announcement: p50 {percentile(latencies, 50):.3f}s, p95 {percentile(latencies, 95):.3f}s, "
+              f"p99 {percentile(latencies, 99):.3f}s, max {max(latencies, default=float('nan')):.3f}s")
+        print(f"{announcer.merged} completions merged into summaries, {announcer.dropped} dropped as stale")
+        print(f"peak threads: {peak_threads}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Soak test for thread, handle and memory leaks. Synthetic results,
+confirmations and LIS uploads are written into a temporary IH-COM folder
+tree watched by an Instrument, the observer, handlers and worker pools
+WatchFolder runs, for --hours of virtual time compressed --speed times.
+Speech, audio and the LIS transmitter are replaced as in replay.py.
+
+Thread count, open file handles, RSS and queue depths are sampled every
+--interval seconds. After the --warmup share of the run, the run fails if
+the least-squares trend of any of them grows by more than --tolerance of
+its mean plus a small absolute slack.
+
+    python benchmarks/soak.py --hours 8 --speed 60 --rate 600
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import deque
+from time import monotonic, sleep
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import alert
+from audio import NullSink
+from bench_memory import rss
+from instrument import Instrument, close_notifications, configure_notifications
+from replay import FakeSpeech, Tree
+from settings import Settings
+from tts import PhraseCache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AUDIO = os.path.join(HERE, os.pardir, "audio")
+
+# growth below these is noise, whatever the tolerance
+SLACK = {"threads": 2, "handles": 8, "rss MB": 8.0}
+QUEUE_SLACK = 20
+
+
+def open_handles():
+    try:
+        import psutil
+
+        process = psutil.Process()
+        return process.num_handles() if os.name == "nt" else process.num_fds()
+    except ImportError:
+        pass
+
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def schedule(hours, rate, alert_ratio):
+    """
+    Virtual (offset, kind, sample_id, assay) of every file, in order. Half
+    of the alerted samples are confirmed before their alert is due.
+    """
+    events = []
+    alert_every = max(int(round(1 / alert_ratio)), 1) if alert_ratio else 0
+    for i in range(int(hours * rate)):
+        sample_id = f"K{i:07d}"
+        offset = i * 3600 / rate
+        alerted = alert_every and i % alert_every == 0
+        confirm = 300 if alerted and i // alert_every % 2 else 60
+        assay = "PR15B" if alerted else "ABO"
+        events.append((offset, "result", sample_id, assay))
+        events.append((offset + confirm, "confirm", sample_id, assay))
+        events.append((offset + confirm + 60, "lis", sample_id, assay))
+    return sorted(events)
+
+
+def trend(points):
+    """
+    Growth of the least-squares line through (time, value) points over their span
+    """
+    n = len(points)
+    if n < 2:
+        return 0.0
+    mean_t = sum(t for t, _ in points) / n
+    mean_v = sum(v for _, v in points) / n
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    if not var:
+        return 0.0
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in points) / var
+    return slope * (points[-1][0] - points[0][0])
+
+
+class Sampler:
+    """
+    Sample the process and the instrument's queues every `interval` seconds
+    """
+
+    def __init__(self, instrument, interval):
+        self._instrument = instrument
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="soak-sampler", daemon=True)
+        self._start = monotonic()
+        self.samples = []
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self):
+        stats = self._instrument.stats()
+        values = {"threads": threading.active_count(), "handles": open_handles(), "rss MB": rss(),
+                  "lis queue": stats["LIS"]["queued"], "ih queue": stats["IH"]["queued"],
+                  "debounce": stats["LIS"]["pending"] + stats["IH"]["pending"],
+                  "alerts": stats["IH"]["alerts"], "announcer": alert.Notification.ANNOUNCER.pending(),
+                  "scheduler": alert.Notification.SCHEDULER.pending()}
+        self.samples.append((monotonic() - self._start, values))
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.sample()
+
+
+def check(samples, warmup, tolerance):
+    """
+    Print the trend of every measure after `warmup` seconds and return
+    the names of those growing beyond the tolerance
+    """
+    samples = [(t, values) for t, values in samples if t >= warmup]
+    if len(samples) < 3:
+        print("too few samples after the warm-up to judge a trend")
+        return []
+
+    failed = []
+    for name in samples[0][1]:
+        points = [(t, values[name]) for t, values in samples if values[name] is not None]
+        if len(points) < 3:
+            continue
+        values = [v for _, v in points]
+        mean = sum(values) / len(values)
+        growth = trend(points)
+        limit = tolerance * mean + SLACK.get(name, QUEUE_SLACK)
+        verdict = "FAIL" if growth > limit else "ok"
+        if growth > limit:
+            failed.append(name)
+        print(f"{name:<10} first {values[0]:>9.1f}  last {values[-1]:>9.1f}  peak {max(values):>9.1f}  "
+              f"trend {growth:>+9.1f}  limit {limit:>8.1f}  {verdict}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=8, help="virtual hours of traffic")
+    parser.add_argument("--speed", type=float, default=60, help="virtual seconds per real second")
+    parser.add_argument("--rate", type=float, default=600, help="samples per virtual hour")
+    parser.add_argument("--alerts", type=float, default=0.2, help="share of samples with an alert rule")
+    parser.add_argument("--alert-wait", type=float, default=180, help="virtual seconds before an alert")
+    parser.add_argument("--interval", type=float, default=5, help="real seconds between samples")
+    parser.add_argument("--warmup", type=float, default=0.2, help="share of the run left out of the trend")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed growth as a share of the mean")
+    parser.add_argument("--keep", type=int, default=500, help="files kept in each folder, oldest removed")
+    parser.add_argument("--bridge", action="store_true", help="send LIS batches to the fake resident bridge")
+    args = parser.parse_args()
+
+    events = schedule(args.hours, args.rate, args.alerts)
+    duration = args.hours * 3600 / args.speed
+    print(f"{len(events)} files over {args.hours:g} virtual hours, {duration:.0f}s real")
+
+    root = tempfile.mkdtemp(prefix="ih-soak-")
+    try:
+        tree = Tree(root)
+        settings = Settings(os.path.join(root, "config.ini"))
+        python = f'"{sys.executable}"'
+        settings.update({
+            "ih_folder": os.path.dirname(tree.results),
+            "lis_folder": tree.lis,
+            "complete_sound": os.path.join(AUDIO, "complete.mp3"),
+            "alert_sound": os.path.join(AUDIO, "alert.mp3"),
+            # the alert delay is read in whole seconds
+            "alert_wait": str(max(int(round(args.alert_wait / args.speed)), 1)),
+            "journal_file": os.path.join(root, "journal.db"),
+            "debounce_quiet": "0.2",
+            "lis_command": f'{python} "{os.path.join(HERE, "stub_lis.py")}" --log "{os.devnull}" --delay 0.05',
+            "lis_bridge": f'{python} "{os.path.join(HERE, "fake_lis_bridge.py")}" --log "{os.devnull}" --delay 0.05'
+                          if args.bridge else "",
+            "lis_workdir": root,
+            "lis_window": "0.5",
+        })
+
+        alert.Notification.AUDIO.set_sink(NullSink())
+        alert.Notification.TTS = PhraseCache(os.path.join(root, "out"), engine=FakeSpeech())
+        configure_notifications(settings)
+
+        # the handlers log every file
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            instrument = Instrument.from_settings(settings)[0]
+            instrument.start()
+            sampler = Sampler(instrument, args.interval)
+            sampler.sample()
+            sampler.start()
+
+            written = {"backup": deque(), "lis": deque()}
+            start = monotonic()
+            for offset, kind, sample_id, assay in events:
+                wait = start + offset / args.speed - monotonic()
+                if wait > 0:
+                    sleep(wait)
+                tree.write(kind, sample_id, assay)
+
+                # keep the folders at a steady size, as the lab's cleanup does
+                if kind == "lis":
+                    files, path = written["lis"], os.path.join(tree.lis, f"{sample_id}.upl")
+                else:
+                    ext = ".xml" if kind == "result" else ".upl"
+                    files, path = written["backup"], os.path.join(tree.backup, f"replay_{sample_id}{ext}")
+                files.append(path)
+                while len(files) > args.keep:
+                    try:
+                        os.remove(files.popleft())
+                    except OSError:
+                        pass
+
+            sampler.stop()
+            instrument.stop()
+            close_notifications()
+
+        failed = check(sampler.samples, duration * args.warmup, args.tolerance)
+        print(f"{len(sampler.samples)} samples")
+        if failed:
+            print(f"FAILED: {', '.join(failed)} kept growing")
+            sys.exit(1)
+        print("PASSED")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Stand-in for AutomationNet.exe: sleeps like a transmitter run and appends
+one line per run to a log file, so LIS batching can be checked locally.
+
+    lis_command = python benchmarks/stub_lis.py --log lis_runs.txt --delay 0.5
+"""
+import argparse
+from datetime import datetime
+from time import sleep
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", default="stub_lis.log")
+    parser.add_argument("--delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    sleep(args.delay)
+    with open(args.log, "a") as f:
+        f.write(f"{datetime.now().isoformat()}\n")
+
+
+if __name__ == "__main__":
+    main()
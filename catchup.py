@@ -0,0 +1,123 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import time
+
+from alert import SampleTest
+
+RESULT = "result"
+CONFIRM = "confirm"
+LIS = "lis"
+
+
+def list_files(ih_folder, lis_folder, since, until):
+    """
+    Return (mtime, kind, path) of the result backups and LIS uploads
+    written after `since` and up to `until`, oldest first
+    """
+    files = []
+
+    def walk(folder, classify):
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            walk(entry.path, classify)
+                            continue
+                        kind = classify(folder, entry.name)
+                        if kind is None:
+                            continue
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    if since < mtime <= until:
+                        files.append((mtime, kind, entry.path))
+        except OSError as e:
+            print(e)
+
+    def backup_kind(folder, name):
+        if os.path.basename(folder) != "Backup" or os.path.basename(os.path.dirname(folder)) != "Results":
+            return None
+        ext = os.path.splitext(name)[1].lower()
+        return RESULT if ext == ".xml" else CONFIRM if ext == ".upl" else None
+
+    def lis_kind(folder, name):
+        return LIS if os.path.splitext(name)[1].lower() == ".upl" else None
+
+    if ih_folder:
+        walk(ih_folder, backup_kind)
+    if lis_folder:
+        walk(lis_folder, lis_kind)
+
+    files.sort()
+    return files
+
+
+def parse(kind, path):
+    """
+    Return the samples of one file and the error met reading it, if any
+    """
+    reader = SampleTest.iter_xml if kind == RESULT else SampleTest.iter_upl
+    try:
+        return list(reader(path)), None
+    except Exception as e:
+        return [], f"{path}: {e}"
+
+
+class CatchUp:
+    """
+    Process the files written while the folders were not watched.
+
+    Files are parsed on `workers` threads, or processes when `processes` is
+    set, and handed to the handlers in the order they were written.
+    Files older than `max_age` seconds are passed as catch-up, so the
+    samples are recorded and logged but not announced.
+    """
+
+    def __init__(self, ih_folder, lis_folder, *, workers=4, processes=False, max_age=600.0):
+        self._ih_folder = ih_folder
+        self._lis_folder = lis_folder
+        self._workers = workers
+        self._processes = processes
+        self._max_age = max_age
+
+    def run(self, ih_handler, lis_handler, since, until, *, ih_submit=None, lis_submit=None):
+        """
+        Feed the files written between `since` and `until` to the handlers,
+        through `ih_submit` and `lis_submit` when given, and return their number
+        """
+        files = list_files(self._ih_folder, self._lis_folder, since, until)
+        if not files:
+            return 0
+
+        executor_class = ProcessPoolExecutor if self._processes else ThreadPoolExecutor
+        with executor_class(max_workers=self._workers) as executor:
+            # map returns the results in the order of the files
+            chunksize = max(len(files) // (self._workers * 8), 1) if self._processes else 1
+            parsed = executor.map(parse, [f[1] for f in files], [f[2] for f in files], chunksize=chunksize)
+
+            for (mtime, kind, path), (samples, error) in zip(files, parsed):
+                handler = lis_handler if kind == LIS else ih_handler
+                if error is not None:
+                    handler.on_error(error)
+                    continue
+
+                submit = lis_submit if kind == LIS else ih_submit
+                elapsed = time() - mtime
+                args = (kind, samples, elapsed, elapsed > self._max_age)
+                if submit is None:
+                    self.dispatch(handler, *args)
+                else:
+                    submit(self.dispatch, handler, *args)
+
+        return len(files)
+
+    @staticmethod
+    def dispatch(handler, kind, samples, elapsed, catch_up):
+        for sample in samples:
+            if kind == LIS:
+                handler.complete_sample(sample, catch_up=catch_up)
+            elif kind == RESULT:
+                handler.receive_sample(sample, elapsed=elapsed, catch_up=catch_up)
+            else:
+                handler.confirm_sample(sample)
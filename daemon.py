@@ -0,0 +1,132 @@
+"""
+Headless IH-Alert service: watches the folders without Qt and publishes
+sample events on an asyncio event bus.
+
+    python daemon.py [config.ini]
+"""
+import asyncio
+import inspect
+import signal
+import sys
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from instrument import Instrument, apply_settings, close_notifications, configure_notifications
+from settings import Settings
+
+
+class EventBus:
+    """
+    Publish/subscribe on an asyncio loop. `publish` can be called from any
+    thread; subscribers are called on the loop, and coroutine subscribers
+    are run as tasks.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._subscribers = defaultdict(list)
+
+    def subscribe(self, topic, callback):
+        self._subscribers[topic].append(callback)
+
+    def publish(self, topic, payload=None):
+        self._loop.call_soon_threadsafe(self._deliver, topic, payload)
+
+    def _deliver(self, topic, payload):
+        for callback in self._subscribers[topic]:
+            try:
+                result = callback(payload)
+                if inspect.isawaitable(result):
+                    self._loop.create_task(result)
+            except Exception as e:
+                print(e)
+
+
+def log(topic):
+    def _log(event):
+        name, sample = event
+        print(f"{datetime.now()}:  [{name}] {sample.sample_id} is {topic}")
+
+    return _log
+
+
+class Service:
+    """
+    Instruments watched by the headless service, publishing their sample
+    events on the bus
+    """
+
+    def __init__(self, settings, bus):
+        self._settings = settings
+        self._bus = bus
+        self._lock = threading.Lock()
+        configure_notifications(settings)
+
+        self.instruments = Instrument.from_settings(settings)
+        for instrument in self.instruments:
+            self.connect(instrument, bus)
+
+    @staticmethod
+    def connect(instrument, bus):
+        name = instrument.name
+        instrument.lis_handler.DELETED.connect(lambda s: bus.publish("completed", (name, s)))
+        instrument.ih_handler.RECEIVED.connect(lambda s: bus.publish("received", (name, s)))
+        instrument.ih_handler.CONFIRMED.connect(lambda s: bus.publish("confirmed", (name, s)))
+        instrument.lis_handler.ERROR.connect(lambda e: bus.publish("error", (name, e)))
+        instrument.ih_handler.ERROR.connect(lambda e: bus.publish("error", (name, e)))
+
+    def start(self):
+        with self._lock:
+            for instrument in self.instruments:
+                instrument.start()
+        self._settings.CHANGED.connect(self.on_settings_changed)
+
+    def stop(self):
+        self._settings.CHANGED.disconnect(self.on_settings_changed)
+        with self._lock:
+            for instrument in self.instruments:
+                instrument.stop()
+
+    def on_settings_changed(self, changed):
+        with self._lock:
+            self.instruments = apply_settings(self.instruments, self._settings, changed,
+                                              setup=lambda instrument: self.connect(instrument, self._bus))
+        print(f"{datetime.now()}:  Settings changed: {', '.join(sorted(changed))}")
+
+
+async def serve(settings):
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except (NotImplementedError, RuntimeError):
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stopping.set))
+
+    bus = EventBus(loop)
+    for topic in ("received", "confirmed", "completed"):
+        bus.subscribe(topic, log(topic))
+    bus.subscribe("error", lambda event: print(f"{datetime.now()}:  [{event[0]}] {event[1]}"))
+
+    service = Service(settings, bus)
+    await loop.run_in_executor(None, service.start)
+    for instrument in service.instruments:
+        print(f"{datetime.now()}:  Watching {instrument.name}")
+
+    await stopping.wait()
+    await loop.run_in_executor(None, service.stop)
+    close_notifications()
+    print(f"{datetime.now()}:  Stopped")
+
+
+def main():
+    settings = Settings.shared(sys.argv[1] if len(sys.argv) > 1 else "config.ini")
+    if bool(int(settings.get("watch_config"))):
+        settings.watch()
+    asyncio.run(serve(settings))
+    settings.unwatch()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import os
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+
+def fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Debouncer:
+    """
+    Collapse repeated file system events for the same path into one dispatch.
+
+    Events for a path are held until no new event arrived for `quiet` seconds
+    (dispatched right away when `quiet` is 0). Callbacks run on `executor`
+    when one is given, otherwise on the scheduler or the calling thread.
+    A callback may return its commit step, which an OrderedPool executor
+    runs in dispatch order.
+    A dispatched path is then remembered with its (mtime, size) for `expiry`
+    seconds, and further events are suppressed as long as the file is
+    unchanged. Paths that no longer exist are not remembered, so deletes
+    are only collapsed within the quiet period. At most `max_entries`
+    paths are remembered.
+    """
+
+    def __init__(self, scheduler=None, *, executor=None, quiet=0.0, expiry=10.0, max_entries=1024):
+        self._scheduler = scheduler
+        self._executor = executor
+        self._quiet = quiet
+        self._expiry = expiry
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()
+        self._pending = {}
+        self._generation = 0
+        self.dispatched = 0
+        self.suppressed = 0
+
+    def configure(self, *, quiet=None, expiry=None):
+        with self._lock:
+            if quiet is not None:
+                self._quiet = float(quiet)
+            if expiry is not None:
+                self._expiry = float(expiry)
+
+    def submit(self, path, callback):
+        with self._lock:
+            quiet = self._quiet
+            if quiet <= 0 or self._scheduler is None:
+                pending = None
+            else:
+                self._generation += 1
+                generation = self._generation
+                pending = self._pending.pop(path, None)
+                job = self._scheduler.schedule(quiet, lambda: self._run(self._dispatch, path, callback, generation))
+                self._pending[path] = (generation, job, callback)
+
+            if pending is not None:
+                pending[1].cancel()
+                self.suppressed += 1
+
+        if quiet <= 0 or self._scheduler is None:
+            self._run(self._dispatch, path, callback)
+
+    def flush(self):
+        """
+        Dispatch the paths still in their quiet period now
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for _, job, _ in pending.values():
+                job.cancel()
+
+        for path, (_, _, callback) in pending.items():
+            self._run(self._dispatch, path, callback)
+
+    def stats(self):
+        with self._lock:
+            return {"dispatched": self.dispatched, "suppressed": self.suppressed,
+                    "pending": len(self._pending), "remembered": len(self._seen)}
+
+    def _run(self, fn, *args):
+        if self._executor is not None:
+            self._executor.submit(fn, *args)
+            return
+
+        # run the commit step of callbacks split in two right away
+        step = fn(*args)
+        if callable(step):
+            step()
+
+    def _dispatch(self, path, callback, generation=None):
+        current = fingerprint(path)
+        now = monotonic()
+
+        with self._lock:
+            if generation is not None:
+                if self._pending.get(path, (None,))[0] != generation:
+                    return
+                del self._pending[path]
+
+            while self._seen and next(iter(self._seen.values()))[1] <= now:
+                self._seen.popitem(last=False)
+
+            # a deleted path has no fingerprint to compare, so its deletes are never suppressed here
+            seen = self._seen.get(path)
+            if current is not None and seen is not None and seen[0] == current:
+                self.suppressed += 1
+                return
+
+            self._seen.pop(path, None)
+            if current is not None:
+                self._seen[path] = (current, now + self._expiry)
+                while len(self._seen) > self._max_entries:
+                    self._seen.popitem(last=False)
+
+            self.dispatched += 1
+
+        return callback()
@@ -0,0 +1,58 @@
+import logging
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from PySide6.QtCore import QObject, QTimer
+
+
+class EventLog(QObject):
+    """
+    Batched, bounded log view on top of a QPlainTextEdit.
+
+    Messages are buffered and appended to the view at most once every
+    `interval` ms, and the view keeps only the last `max_lines` lines.
+    The full history is written to `f_name` at the same time, rotated when
+    it reaches `max_bytes` with `backups` older files kept.
+    """
+
+    def __init__(self, view, *, max_lines=5000, interval=250, f_name=None, max_bytes=1_000_000, backups=5):
+        super().__init__(view)
+        self._view = view
+        self._view.setMaximumBlockCount(max_lines)
+        self._max_lines = max_lines
+        self._buffer = []
+
+        self._file = None
+        if f_name:
+            try:
+                self._file = RotatingFileHandler(f_name, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+                self._file.setFormatter(logging.Formatter("%(message)s"))
+            except OSError as e:
+                print(e)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+
+    def append(self, msg):
+        self._buffer.append(f"{datetime.now()}:  {msg}")
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        if not self._buffer:
+            return
+
+        lines, self._buffer = self._buffer, []
+        if self._file is not None:
+            self._file.emit(logging.makeLogRecord({"msg": "\n".join(lines)}))
+
+        self._view.appendPlainText("\n".join(lines[-self._max_lines:]))
+
+    def close(self):
+        self._timer.stop()
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,73 @@
+"""
+Compiled user interfaces.
+
+`python forms.py` compiles every .ui file next to this script into a
+`ui_<name>.py` module with pyside6-uic. `load_form` builds the interface
+from that module, which skips parsing the XML at startup, and falls back
+to `uic.loadUi` when the module is missing or was compiled from a
+different version of the .ui file.
+"""
+import glob
+import hashlib
+import importlib
+import os
+import subprocess
+import sys
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def digest(ui_file):
+    with open(ui_file, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def module_name(ui_file):
+    return "ui_" + os.path.splitext(os.path.basename(ui_file))[0]
+
+
+def compiled_form(ui_file):
+    """
+    Return the Ui_ class compiled from `ui_file`, or None when it is missing or stale
+    """
+    try:
+        module = importlib.import_module(module_name(ui_file))
+        if module.SOURCE_DIGEST != digest(ui_file):
+            return None
+    except (ImportError, AttributeError, OSError):
+        return None
+
+    return next((v for k, v in vars(module).items() if k.startswith("Ui_")), None)
+
+
+def load_form(ui_file, base):
+    form = compiled_form(ui_file)
+    if form is None:
+        from uic import loadUi
+
+        loadUi(ui_file, base)
+        return
+
+    # like loadUi, make the widgets attributes of the base instance
+    ui = form()
+    ui.setupUi(base)
+    for name, widget in vars(ui).items():
+        setattr(base, name, widget)
+
+
+def compile_form(ui_file):
+    code = subprocess.run(["pyside6-uic", ui_file], capture_output=True, text=True, check=True).stdout
+    target = os.path.join(os.path.dirname(ui_file), module_name(ui_file) + ".py")
+    with open(target, "w", encoding="utf-8") as f:
+        f.write(code)
+        f.write(f"\n\nSOURCE_DIGEST = {digest(ui_file)!r}\n")
+
+    return target
+
+
+if __name__ == "__main__":
+    for ui_file in sys.argv[1:] or sorted(glob.glob(os.path.join(FOLDER, "*.ui"))):
+        try:
+            print(compile_form(ui_file))
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(e)
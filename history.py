@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+from time import time
+
+
+class SampleHistory:
+    """
+    The last state of recently seen samples, oldest first. At most
+    `max_entries` samples are kept, and samples not seen for `max_age`
+    seconds are evicted.
+    """
+
+    def __init__(self, *, max_entries=1000, max_age=86400.0):
+        self._max_entries = max_entries
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def configure(self, *, max_entries=None, max_age=None):
+        with self._lock:
+            if max_entries is not None:
+                self._max_entries = int(max_entries)
+            if max_age is not None:
+                self._max_age = float(max_age)
+            self._evict(time())
+
+    def add(self, sample, state):
+        now = time()
+        with self._lock:
+            self._entries.pop(sample.sample_id, None)
+            self._entries[sample.sample_id] = (sample, state, now)
+            self._evict(now)
+
+    def get(self, sample_id):
+        with self._lock:
+            entry = self._entries.get(sample_id)
+            return None if entry is None else entry[:2]
+
+    def recent(self, count=None):
+        """
+        Return up to `count` (sample, state, time) entries, newest first
+        """
+        with self._lock:
+            self._evict(time())
+            entries = list(reversed(self._entries.values()))
+        return entries if count is None else entries[:count]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self, now):
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        while self._entries and next(iter(self._entries.values()))[2] < now - self._max_age:
+            self._entries.popitem(last=False)
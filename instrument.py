@@ -0,0 +1,267 @@
+import os
+import threading
+from time import time
+
+import alert
+from catchup import CatchUp
+from debounce import Debouncer
+from history import SampleHistory
+from journal import Journal, RECEIVED, CONFIRMED, COMPLETED
+from rules import RuleEngine
+from scheduler import Scheduler
+from workers import Gate, OrderedPool
+
+# options only read when the instruments are built
+RESTART_OPTIONS = {"journal_file", "polling", "poll_interval", "poll_max_interval"}
+WATERMARK_INTERVAL = 30
+NOTIFICATION_OPTIONS = {"lis_command", "lis_workdir", "lis_window", "lis_bridge", "lis_timeout",
+                        "announce_max_age", "announce_summary"}
+
+
+class Instrument:
+    """
+    Observer, folder handlers and worker pools of one analyzer.
+
+    Every instrument has its own observer, an OrderedPool per handler and
+    a timer ending the quiet periods of its files, so a slow or
+    overflowing share on one analyzer doesn't hold up the events of the
+    others or the alerts on the shared scheduler.
+    """
+
+    def __init__(self, config: dict, settings, *, default=False):
+        self.name = config["name"]
+        self._config = config
+
+        journal_file = settings.get("journal_file")
+        if not default:
+            base, ext = os.path.splitext(journal_file)
+            journal_file = f"{base}-{self.name}{ext}"
+        self.journal = Journal(journal_file)
+
+        self._executors = [OrderedPool(workers=int(settings.get("worker_threads")),
+                                       max_pending=int(settings.get("worker_queue")), name=f"{self.name} {folder}")
+                           for folder in ("lis", "ih")]
+        # live events wait behind these while the catch-up queues its files
+        self._gates = [Gate(executor) for executor in self._executors]
+
+        quiet, expiry = float(settings.get("debounce_quiet")), float(settings.get("debounce_expiry"))
+        # the quiet periods end on a timer of their own: handing a file to a full
+        # pool blocks, which must not hold a worker of the shared scheduler
+        self._debounce_timer = Scheduler(workers=1, name=f"{self.name} debounce")
+        self.lis_handler = alert.LisFolderHandler(
+            audio_file=config["complete_sound"], delay=0, journal=self.journal,
+            debouncer=Debouncer(self._debounce_timer, executor=self._gates[0], quiet=quiet, expiry=expiry))
+        self.ih_handler = alert.IhFolderHandler(
+            audio_file=config["alert_sound"], delay=int(config["alert_wait"]), journal=self.journal,
+            debouncer=Debouncer(self._debounce_timer, executor=self._gates[1], quiet=quiet, expiry=expiry),
+            rules=RuleEngine(self.parse_rules(config)))
+
+        self.history = SampleHistory(max_entries=int(settings.get("history_size")),
+                                     max_age=float(settings.get("history_age")))
+        self.lis_handler.DELETED.connect(lambda sample: self.history.add(sample, COMPLETED))
+        self.ih_handler.RECEIVED.connect(lambda sample: self.history.add(sample, RECEIVED))
+        self.ih_handler.CONFIRMED.connect(lambda sample: self.history.add(sample, CONFIRMED))
+
+        self.observer = alert.ObserveCenter.from_settings(settings)
+        self._watches = {}
+        self._catch_up = {"workers": int(settings.get("catchup_workers")),
+                          "processes": bool(int(settings.get("catchup_processes"))),
+                          "max_age": float(settings.get("catchup_max_age"))}
+        self._watermark_job = None
+        self._stopped = False
+
+    @classmethod
+    def from_settings(cls, settings):
+        return [cls(config, settings, default=config["name"] == "IH")
+                for config in settings.get_instruments()]
+
+    @staticmethod
+    def parse_rules(config):
+        return RuleEngine.parse(config["alert_rules"], sound=config["alert_sound"], delay=int(config["alert_wait"]))
+
+    def reload_rules(self, config):
+        """
+        Apply the alert rules of `config` without restarting the observer
+        """
+        self._config = config
+        self.ih_handler.rules.load(self.parse_rules(config))
+
+    def apply(self, config):
+        """
+        Apply the options of `config` that changed while running. Sounds,
+        delays and rules are used by the next sample, and only the watch
+        of a folder that changed is scheduled again.
+        """
+        old = self._config
+
+        if old["complete_sound"] != config["complete_sound"]:
+            self.lis_handler.configure(audio_file=config["complete_sound"])
+            alert.Notification.AUDIO.preload(config["complete_sound"])
+
+        if old["alert_sound"] != config["alert_sound"]:
+            self.ih_handler.configure(audio_file=config["alert_sound"])
+            alert.Notification.AUDIO.preload(config["alert_sound"])
+
+        if any(old[opt] != config[opt] for opt in ("alert_sound", "alert_wait", "alert_rules")):
+            self.reload_rules(config)
+
+        self._config = config
+        for folder, handler in (("lis_folder", self.lis_handler), ("ih_folder", self.ih_handler)):
+            if old[folder] != config[folder]:
+                self._schedule(folder, handler)
+
+    def configure_debouncers(self, settings):
+        for handler in (self.lis_handler, self.ih_handler):
+            handler.debouncer.configure(quiet=settings.get("debounce_quiet"), expiry=settings.get("debounce_expiry"))
+
+    @property
+    def sounds(self):
+        return self._config["complete_sound"], self._config["alert_sound"]
+
+    def start(self):
+        self.ih_handler.restore()
+        since = self.journal.watermark()
+        if since is not None:
+            # so no live event commits before an older file found by the catch-up
+            for gate in self._gates:
+                gate.close()
+
+        # files written from now on are seen by the observer, older ones by the catch-up
+        until = time()
+        self._schedule("lis_folder", self.lis_handler)
+        self._schedule("ih_folder", self.ih_handler)
+        self.observer.start()
+
+        if since is None:
+            self._update_watermark(until)
+        else:
+            # its own thread, so a long scan holds no scheduler worker
+            threading.Thread(target=self.catch_up, args=(since, until), name=f"{self.name} catch-up",
+                             daemon=True).start()
+
+    def catch_up(self, since, until):
+        """
+        Process the files written between `since` and `until`, while the
+        folders were not watched, then let the live events through and
+        keep the watermark up to date
+        """
+        catch_up = CatchUp(self._config["ih_folder"], self._config["lis_folder"], **self._catch_up)
+        try:
+            count = catch_up.run(self.ih_handler, self.lis_handler, since, until,
+                                 ih_submit=self._executors[1].commit, lis_submit=self._executors[0].commit)
+            if count:
+                print(f"[{self.name}] {count} files written while stopped")
+        except Exception as e:
+            print(e)
+            return
+        finally:
+            for gate in self._gates:
+                gate.open()
+
+        self._update_watermark(until)
+
+    def _update_watermark(self, ts=None):
+        if self._stopped:
+            return
+        self.journal.set_watermark(time() if ts is None else ts)
+        self._watermark_job = alert.Notification.SCHEDULER.schedule(WATERMARK_INTERVAL, self._update_watermark)
+
+    def _schedule(self, folder, handler):
+        watch = self._watches.pop(folder, None)
+        if watch is not None:
+            self.observer.unschedule(watch)
+
+        if self._config[folder]:
+            try:
+                self._watches[folder] = self.observer.schedule(handler, self._config[folder], True)
+            except OSError as e:
+                handler.on_error(e)
+
+    def stop(self):
+        self._stopped = True
+        if self._watermark_job is not None:
+            self._watermark_job.cancel()
+            self.journal.set_watermark(time())
+
+        # the observer can't be joined while its thread waits on a gate
+        for gate in self._gates:
+            gate.open()
+        self.observer.stop()
+        self.observer.join()
+        # dispatch the files still in their quiet period; the watermark is
+        # already past them, so the next catch-up would not find them
+        for handler in (self.lis_handler, self.ih_handler):
+            handler.debouncer.flush()
+        self._debounce_timer.shutdown(wait=True)
+        for executor in self._executors:
+            executor.shutdown()
+        self.ih_handler.stop_notifications()
+        self.journal.close()
+
+    def stats(self):
+        return {"LIS": {**self.lis_handler.debouncer.stats(), **self._executors[0].stats()},
+                "IH": {**self.ih_handler.debouncer.stats(), **self._executors[1].stats(),
+                       "alerts": self.ih_handler.alert_count}}
+
+
+def configure_notifications(settings):
+    """
+    Apply the LIS and announcement options shared by every instrument
+    """
+    alert.Notification.LIS.configure(command=settings.get("lis_command"), workdir=settings.get("lis_workdir"),
+                                     window=settings.get("lis_window"), bridge=settings.get("lis_bridge"),
+                                     timeout=settings.get("lis_timeout"))
+    alert.Notification.ANNOUNCER.configure(max_age=settings.get("announce_max_age"),
+                                           summary_threshold=settings.get("announce_summary"))
+
+
+def close_notifications():
+    """
+    Stop the resident LIS bridge, if one was started
+    """
+    alert.Notification.LIS.close()
+
+
+def apply_settings(instruments, settings, changed, *, setup=None):
+    """
+    Bring running `instruments` in line with `settings` after the options in
+    `changed` were changed, and return the instruments now running.
+    Instruments are reconfigured in place where possible, new sections are
+    started after passing them to `setup`, and removed ones are stopped.
+    """
+    if changed & NOTIFICATION_OPTIONS:
+        configure_notifications(settings)
+
+    if changed & RESTART_OPTIONS:
+        for instrument in instruments:
+            instrument.stop()
+        instruments = []
+
+    if changed & {"debounce_quiet", "debounce_expiry"}:
+        for instrument in instruments:
+            instrument.configure_debouncers(settings)
+
+    if changed & {"history_size", "history_age"}:
+        for instrument in instruments:
+            instrument.history.configure(max_entries=settings.get("history_size"),
+                                         max_age=settings.get("history_age"))
+
+    configs = {config["name"]: config for config in settings.get_instruments()}
+    running = []
+    for instrument in instruments:
+        config = configs.pop(instrument.name, None)
+        if config is None:
+            instrument.stop()
+            continue
+        instrument.apply(config)
+        running.append(instrument)
+
+    for config in configs.values():
+        instrument = Instrument(config, settings, default=config["name"] == "IH")
+        if setup is not None:
+            setup(instrument)
+        alert.Notification.AUDIO.preload(*instrument.sounds)
+        instrument.start()
+        running.append(instrument)
+
+    return running
@@ -0,0 +1,142 @@
+import queue
+import sqlite3
+import threading
+from time import time
+
+RECEIVED = "RECEIVED"
+CONFIRMED = "CONFIRMED"
+COMPLETED = "COMPLETED"
+
+
+class Journal:
+    """
+    Append-only record of sample state transitions, kept in SQLite so
+    pending alerts survive a restart.
+
+    `record` only queues the transition; a writer thread stores queued
+    transitions in batches and compacts the table every `compact_every`
+    writes, keeping the latest row of each sample and dropping samples
+    that finished more than `retention` seconds ago.
+    """
+
+    def __init__(self, f_name="journal.db", *, batch_size=100, compact_every=1000, retention=24 * 3600):
+        self._f_name = f_name
+        self._batch_size = batch_size
+        self._compact_every = compact_every
+        self._retention = retention
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._writes = 0
+
+    def record(self, sample_id, state, *, deadline=None, sound=None):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+                self._thread.start()
+            # under the lock, so nothing is queued behind the sentinel of `close`
+            self._queue.put((time(), sample_id, state, deadline, sound))
+
+    def flush(self):
+        """
+        Wait until every recorded transition has been written
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """
+        Write the recorded transitions and stop the writer thread
+        """
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put(None)
+        thread.join()
+
+    def pending(self):
+        """
+        Return {sample id: (alert deadline, alert sound)} of the samples that
+        were received but not yet confirmed or completed. Both are None for
+        samples without an alert.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT sample_id, deadline, sound FROM events "
+                "WHERE id IN (SELECT MAX(id) FROM events GROUP BY sample_id) AND state = ?",
+                (RECEIVED,)).fetchall()
+        finally:
+            conn.close()
+
+        return {sample_id: (deadline, sound) for sample_id, deadline, sound in rows}
+
+    def watermark(self):
+        """
+        Return the time up to which the folders were watched, or None
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+        finally:
+            conn.close()
+
+        return None if row is None else row[0]
+
+    def set_watermark(self, ts):
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)", (ts,))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(e)
+        finally:
+            conn.close()
+
+    def compact(self, conn):
+        conn.execute("DELETE FROM events WHERE id NOT IN (SELECT MAX(id) FROM events GROUP BY sample_id)")
+        conn.execute("DELETE FROM events WHERE state != ? AND ts < ?", (RECEIVED, time() - self._retention))
+        conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self._f_name)
+        conn.execute("CREATE TABLE IF NOT EXISTS events ("
+                     "id INTEGER PRIMARY KEY, ts REAL, sample_id TEXT, state TEXT, deadline REAL, sound TEXT)")
+        # journals written before alert sounds were stored
+        if "sound" not in [row[1] for row in conn.execute("PRAGMA table_info(events)")]:
+            conn.execute("ALTER TABLE events ADD COLUMN sound TEXT")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL)")
+        return conn
+
+    def _run(self):
+        conn = self._connect()
+
+        closed = False
+        while not closed:
+            batch = [self._queue.get()]
+            while len(batch) < self._batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # None is queued by `close`, after every transition to write
+            closed = batch[-1] is None
+            rows = batch[:-1] if closed else batch
+            try:
+                conn.executemany("INSERT INTO events (ts, sample_id, state, deadline, sound) "
+                                 "VALUES (?, ?, ?, ?, ?)", rows)
+                conn.commit()
+
+                self._writes += len(rows)
+                if self._writes >= self._compact_every:
+                    self._writes = 0
+                    self.compact(conn)
+            except sqlite3.Error as e:
+                print(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+        conn.close()
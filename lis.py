@@ -0,0 +1,325 @@
+import itertools
+import json
+import os
+import shlex
+import subprocess
+import threading
+from collections import deque
+from time import monotonic
+
+from metrics import METRICS
+
+
+class LisBatch:
+    """
+    Completions sent to LIS by one run of the transmitter
+    """
+
+    def __init__(self):
+        self.names = []
+        self._callbacks = []
+        self.first_submit = None
+        self.wait = 0.0
+        self.run = 0.0
+        self._done = threading.Event()
+
+    def add(self, name, callback=None):
+        if self.first_submit is None:
+            self.first_submit = monotonic()
+        self.names.append(name)
+        if callback is not None:
+            self._callbacks.append(callback)
+
+    def finish(self):
+        self._done.set()
+        # batches are kept for their timings; don't keep the notifications alive with them
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(e)
+
+    def wait_done(self, timeout=None):
+        return self._done.wait(timeout)
+
+    @property
+    def latency(self):
+        return self.wait + self.run
+
+
+def command_args(command, workdir):
+    args = shlex.split(command, posix=os.name != "nt")
+    if os.name == "nt":
+        # non-posix splitting keeps the quotes around "C:\Program Files\..."
+        args = [arg[1:-1] if len(arg) > 1 and arg[0] == arg[-1] == '"' else arg for arg in args]
+    if args and workdir and not os.path.isabs(args[0]) and os.path.isfile(os.path.join(workdir, args[0])):
+        args[0] = os.path.join(workdir, args[0])
+    return args
+
+
+class LisBridge:
+    """
+    Client of a resident LIS transmitter, started once from `command` and
+    kept running, so a batch costs a request instead of a process start.
+
+    Requests and replies are JSON lines on the bridge's stdin and stdout:
+
+        {"id": 1, "op": "transmit", "samples": ["S1", "S2"]}
+        {"id": 2, "op": "ping"}
+        {"id": 1, "ok": true}  or  {"id": 1, "ok": false, "error": "..."}
+
+    A request not answered within `timeout` seconds kills the bridge, and
+    the bridge is pinged every `ping_interval` seconds and restarted when
+    it has exited or doesn't answer.
+    """
+
+    def __init__(self, command, *, workdir=None, timeout=60.0, ping_interval=10.0, ping_timeout=5.0):
+        self._command = command
+        self._workdir = workdir
+        self._timeout = timeout
+        self._ping_interval = ping_interval
+        self._ping_timeout = ping_timeout
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = None
+        self._ids = itertools.count(1)
+        self._process = None
+        self._closed = threading.Event()
+        self._monitor = None
+        self.starts = 0
+        self.timeouts = 0
+
+    def configure(self, *, timeout=None):
+        if timeout is not None:
+            self._timeout = float(timeout)
+
+    def transmit(self, names):
+        """
+        Send one batch and return whether the bridge confirmed it
+        """
+        with self._lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(target=self._check, name="lis-bridge", daemon=True)
+                self._monitor.start()
+            return self._request({"op": "transmit", "samples": list(names)}, self._timeout)
+
+    def ping(self):
+        with self._lock:
+            return self._request({"op": "ping"}, self._ping_timeout)
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            self._kill()
+
+    def _check(self):
+        while not self._closed.wait(self._ping_interval):
+            if not self.ping():
+                print("LIS bridge not answering, restarting")
+                # start the next one now rather than on the next batch
+                self.ping()
+
+    def _request(self, message, timeout):
+        if self._closed.is_set():
+            return False
+        if self._process is None or self._process.poll() is not None:
+            if not self._start():
+                return False
+
+        message["id"] = request_id = next(self._ids)
+        entry = [threading.Event(), None]
+        with self._pending_lock:
+            if self._pending is None:
+                self._kill()
+                return False
+            self._pending[request_id] = entry
+
+        try:
+            self._process.stdin.write(json.dumps(message) + "\n")
+            self._process.stdin.flush()
+        except (OSError, ValueError) as e:
+            print(f"LIS bridge: {e}")
+            self._kill()
+            return False
+
+        if not entry[0].wait(timeout):
+            self.timeouts += 1
+            print(f"LIS bridge: no reply to {message['op']} in {timeout:g}s")
+            self._kill()
+            return False
+
+        reply = entry[1] or {}
+        if not reply.get("ok"):
+            print(f"LIS bridge: {reply.get('error', 'failed')}")
+        return bool(reply.get("ok"))
+
+    def _start(self):
+        self._kill()
+        args = command_args(self._command, self._workdir)
+        if not args:
+            return False
+        try:
+            process = subprocess.Popen(args, cwd=self._workdir or None, stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE, text=True, bufsize=1)
+        except Exception as e:
+            print(e)
+            return False
+
+        with self._pending_lock:
+            self._pending = pending = {}
+        self._process = process
+        self.starts += 1
+        threading.Thread(target=self._read, args=(process, pending), name="lis-bridge-reader", daemon=True).start()
+        return True
+
+    def _read(self, process, pending):
+        for line in process.stdout:
+            try:
+                reply = json.loads(line)
+                with self._pending_lock:
+                    entry = pending.pop(reply["id"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            entry[1] = reply
+            entry[0].set()
+
+        process.wait()
+        # fail whatever was still waiting on this process
+        with self._pending_lock:
+            if self._pending is pending:
+                self._pending = None
+            waiting = list(pending.values())
+            pending.clear()
+        for entry in waiting:
+            entry[1] = {"ok": False, "error": f"bridge exited with {process.returncode}"}
+            entry[0].set()
+
+    def _kill(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.kill()
+            process.wait(5)
+        except Exception as e:
+            print(e)
+
+
+class LisDispatcher:
+    """
+    Collect completions inside a time window and run the LIS transmitter
+    once per batch instead of once per result, or hand the batch to a
+    resident LisBridge when `bridge` is set, falling back to the command
+    when the bridge fails. A transmitter still running after `timeout`
+    seconds is killed.
+    """
+
+    def __init__(self, *, command="AutomationNet.exe", workdir=r"c:\automation", window=1.0, history=100,
+                 bridge="", timeout=60.0):
+        self._command = command
+        self._workdir = workdir
+        self._window = window
+        self._timeout = timeout
+        self._bridge_command = bridge
+        self._bridge = None
+        self._cond = threading.Condition()
+        self._batch = None
+        self._thread = None
+        self.batches = deque(maxlen=history)
+
+    def configure(self, *, command=None, workdir=None, window=None, bridge=None, timeout=None):
+        with self._cond:
+            if command is not None:
+                self._command = command
+            if workdir is not None:
+                if workdir != self._workdir:
+                    self._close_bridge()
+                self._workdir = workdir
+            if window is not None:
+                self._window = float(window)
+            if timeout is not None:
+                self._timeout = float(timeout)
+                if self._bridge is not None:
+                    self._bridge.configure(timeout=timeout)
+            if bridge is not None and bridge != self._bridge_command:
+                self._close_bridge()
+                self._bridge_command = bridge
+
+    @property
+    def bridge(self):
+        return self._bridge
+
+    def close(self):
+        with self._cond:
+            self._close_bridge()
+
+    def _close_bridge(self):
+        if self._bridge is not None:
+            # the dispatcher thread may still hold it for a batch in flight
+            threading.Thread(target=self._bridge.close, daemon=True).start()
+            self._bridge = None
+
+    def submit(self, name, callback=None):
+        """
+        Queue a completion and return the batch it will be sent in.
+        `callback` is called on the dispatcher thread once the batch is
+        transmitted, or call `wait_done()` on the batch to block until then.
+        """
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="lis-dispatcher", daemon=True)
+                self._thread.start()
+
+            if self._batch is None:
+                self._batch = LisBatch()
+                self._cond.notify()
+
+            batch = self._batch
+            batch.add(name, callback)
+
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._batch is None:
+                    self._cond.wait()
+
+                remaining = self._batch.first_submit + self._window - monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+
+                batch, self._batch = self._batch, None
+                command, workdir, timeout = self._command, self._workdir, self._timeout
+                if self._bridge is None and self._bridge_command:
+                    self._bridge = LisBridge(self._bridge_command, workdir=workdir, timeout=timeout)
+                bridge = self._bridge
+
+            batch.wait = monotonic() - batch.first_submit
+            started = monotonic()
+            if bridge is None or not bridge.transmit(batch.names):
+                if bridge is not None:
+                    print(f"LIS bridge failed, running {command}")
+                self.transmit(command, workdir, timeout)
+            batch.run = monotonic() - started
+            METRICS.record("lis wait", batch.wait)
+            METRICS.record("lis transmit", batch.run)
+
+            self.batches.append(batch)
+            print(f"LIS batch of {len(batch.names)}: waited {batch.wait:.2f}s, transmitted in {batch.run:.2f}s")
+            batch.finish()
+
+    @staticmethod
+    def transmit(command, workdir, timeout=None):
+        args = command_args(command, workdir)
+        if not args:
+            return
+
+        try:
+            subprocess.run(args, cwd=workdir or None, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            print(f"LIS transmitter killed after {timeout:g}s")
+        except Exception as e:
+            print(e)
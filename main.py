@@ -1,15 +1,20 @@
+import functools
 import sys
+import threading
 
 from PySide6 import QtWidgets
-from PySide6.QtCore import QThread, Signal, QCoreApplication, Qt, QTime, QSystemSemaphore, QSharedMemory
-from time import sleep
+from PySide6.QtCore import QThread, Signal, QCoreApplication, Qt, QTime, QSystemSemaphore, QSharedMemory, QTimer
 from datetime import timedelta, datetime
 
+from PySide6.QtGui import QFontDatabase
 from PySide6.QtWidgets import QFileDialog
 
 import alert
+from eventlog import EventLog
+from instrument import Instrument, apply_settings, close_notifications, configure_notifications
+from metrics import METRICS
 from settings import Settings
-from uic import loadUi
+from forms import load_form
 
 
 def to_qtime(str_time):
@@ -30,30 +35,54 @@ class WatchFolder(QThread):
 
     def __init__(self, config):
         super().__init__()
-        self._running = False
+        self._wake = threading.Event()
+        self._stopping = False
+        self._lock = threading.Lock()
         self._config = config
-        self._time_start, self._time_end = self.get_timer()
+        self._termination_times = self.get_timer()
+        self._start_time = None
+        self._instruments = None
 
     def run(self):
-        self._running = True
-        ob = alert.ObserveCenter()
-        lis_handler = alert.LisFolderHandler(audio_file=self._config.get("complete_sound"), delay=0)
-        lis_handler.DELETED.connect(self.on_lis_complete)
-        ih_handler = alert.IhFolderHandler(audio_file=self._config.get("alert_sound"), delay=60)
-        ih_handler.RECEIVED.connect(self.on_received)
-        ih_handler.CONFIRMED.connect(self.on_confirmed)
-        ob.schedule(lis_handler, self._config.get("lis_folder"), True)
-        ob.schedule(ih_handler, self._config.get("ih_folder"), True)
-        ob.start()
-        while self._running:
-            self.WATCHING.emit(f"Running time: {timedelta(seconds=ob.get_run_time())}")
-            if self.to_terminate():
-                self.stop()
+        configure_notifications(self._config)
+
+        with self._lock:
+            self._instruments = Instrument.from_settings(self._config)
+            for instrument in self._instruments:
+                alert.Notification.AUDIO.preload(*instrument.sounds)
+                self.connect_instrument(instrument)
+                instrument.start()
+        self._config.CHANGED.connect(self.on_settings_changed)
+
+        self._start_time = datetime.now()
+        self.WATCHING.emit("Running")
+
+        deadline = self.next_termination(self._start_time)
+        while True:
+            # wake up at least every minute in case the system clock is changed
+            timeout = 60 if deadline is None else min((deadline - datetime.now()).total_seconds(), 60)
+            if self._wake.wait(max(timeout, 0)):
+                self._wake.clear()
+                if self._stopping:
+                    break
+                deadline = self.next_termination(datetime.now())
+
+            if deadline is not None and datetime.now() >= deadline:
                 self.QUIT.emit()
-            sleep(1)
+                break
 
-        ob.stop()
-        ob.join()
+        self._config.CHANGED.disconnect(self.on_settings_changed)
+        self._start_time = None
+
+        with self._lock:
+            instruments, self._instruments = self._instruments, None
+
+        for instrument in instruments:
+            instrument.stop()
+            for folder, stats in instrument.stats().items():
+                self.NOTIFY.emit(f"[{instrument.name}] {folder} events: {stats['dispatched']} dispatched, "
+                                 f"{stats['suppressed']} suppressed, queue peak {stats['peak']}, "
+                                 f"{stats['blocked']} blocked")
 
         self.FINISHED.emit("Stopped")
 
@@ -64,61 +93,126 @@ class WatchFolder(QThread):
         time_start = []
         for e, t in zip(t_enable, t_time):
             if bool(int(e)):
-                time_start.append(to_datetime(t))
-        time_end = [t + timedelta(seconds=3) for t in time_start]
+                time_start.append(to_datetime(t).time())
+
+        return time_start
 
-        return time_start, time_end
+    def next_termination(self, now):
+        """
+        Return the first enabled termination time after `now`, or None
+        """
+        deadlines = []
+        for t in self._termination_times:
+            deadline = datetime.combine(now.date(), t)
+            if deadline <= now:
+                deadline += timedelta(days=1)
+            deadlines.append(deadline)
 
-    def to_terminate(self):
-        now = datetime.now().time()
+        return min(deadlines, default=None)
 
-        for t1, t2 in zip(self._time_start, self._time_end):
-            if (now > t1.time()) and (now < t2.time()):
-                return True
+    def run_time(self):
+        if self._start_time is None:
+            return -1
 
-        return False
+        return (datetime.now() - self._start_time).seconds
 
     def stop(self):
-        self._running = False
+        self._stopping = True
+        self._wake.set()
+
+    def connect_instrument(self, instrument):
+        name = instrument.name
+        instrument.lis_handler.DELETED.connect(functools.partial(self.on_lis_complete, name))
+        instrument.ih_handler.RECEIVED.connect(functools.partial(self.on_received, name))
+        instrument.ih_handler.CONFIRMED.connect(functools.partial(self.on_confirmed, name))
+
+    def on_settings_changed(self, changed):
+        if "metrics_enabled" in changed:
+            METRICS.enabled = bool(int(self._config.get("metrics_enabled")))
+
+        if changed & {"termination_time", "termination_enable"}:
+            self._termination_times = self.get_timer()
+            self._wake.set()
+
+        with self._lock:
+            if self._instruments is None:
+                return
+            self._instruments = apply_settings(self._instruments, self._config, changed, setup=self.connect_instrument)
+
+        self.NOTIFY.emit(f"Settings changed: {', '.join(sorted(changed))}")
+
+    def recent_samples(self, count=20):
+        """
+        Return up to `count` (time, instrument, sample, state) of the samples
+        seen last by any instrument, newest first
+        """
+        with self._lock:
+            instruments = list(self._instruments or ())
+
+        entries = [(ts, instrument.name, sample, state)
+                   for instrument in instruments for sample, state, ts in instrument.history.recent(count)]
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+        return entries[:count]
 
-    def on_lis_complete(self, sample):
-        self.NOTIFY.emit(f"{sample.sample_id} is completed")
+    def on_lis_complete(self, instrument, sample):
+        self.NOTIFY.emit(f"[{instrument}] {sample.sample_id} is completed")
 
-    def on_received(self, sample):
-        self.NOTIFY.emit(f"{sample.sample_id} is received")
+    def on_received(self, instrument, sample):
+        self.NOTIFY.emit(f"[{instrument}] {sample.sample_id} is received")
 
-    def on_confirmed(self, sample):
-        self.NOTIFY.emit(f"{sample.sample_id} is confirmed")
+    def on_confirmed(self, instrument, sample):
+        self.NOTIFY.emit(f"[{instrument}] {sample.sample_id} is confirmed")
 
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
-        loadUi("mainWindow.ui", self)
+        load_form("mainWindow.ui", self)
         self.setWindowTitle("IH-Alert")
 
         self._watch = None
 
+        config = Settings.shared("config.ini")
+        if bool(int(config.get("watch_config"))):
+            config.watch()
+        self._log = EventLog(self.plainTextEdit,
+                             max_lines=int(config.get("log_max_lines")),
+                             interval=int(config.get("log_interval")),
+                             f_name=config.get("log_file"),
+                             max_bytes=int(config.get("log_max_bytes")),
+                             backups=int(config.get("log_backups")))
+
         self.pushButton_start.clicked.connect(self.btn_start_clicked)
         self.pushButton_stop.clicked.connect(self.btn_stop_clicked)
         self.actionSettings.triggered.connect(self.show_setting)
+        self.actionDiagnostics.triggered.connect(self.show_diagnostics)
+
+        self._clock = QTimer(self)
+        self._clock.timeout.connect(self.show_run_time)
+        self._clock.start(1000)
 
         self.btn_start_clicked()
 
         self.update()
 
     def show_setting(self):
-        self.btn_stop_clicked()
-        widget = SettingWindow()
-        widget.CLOSE.connect(self.btn_start_clicked)
-        widget.show()
+        self._setting = SettingWindow()
+        self._setting.show()
+
+    def show_diagnostics(self):
+        self._diagnostics = DiagnosticsWindow(samples=self.recent_samples)
+        self._diagnostics.show()
+
+    def recent_samples(self):
+        return self._watch.recent_samples() if self._watch is not None else []
 
     def btn_start_clicked(self):
         self.update_status_bar("Starting")
         if self._watch is not None:
             self.btn_stop_clicked()
 
-        config = Settings("config.ini")
+        config = Settings.shared("config.ini")
+        METRICS.enabled = bool(int(config.get("metrics_enabled")))
         self._watch = WatchFolder(config)
         self._watch.WATCHING.connect(self.update_status_bar)
         self._watch.FINISHED.connect(self.update_event_log)
@@ -135,16 +229,20 @@ class MainWindow(QtWidgets.QMainWindow):
         self._watch.stop()
         self.update_status_bar("Stopping")
 
+    def show_run_time(self):
+        if self._watch is None:
+            return
+
+        run_time = self._watch.run_time()
+        if run_time >= 0:
+            self.update_status_bar(f"Running time: {timedelta(seconds=run_time)}")
+
     def update_status_bar(self, msg):
         self.statusBar().showMessage(msg)
         self.update()
 
-    def update_plain_text(self, msg):
-        self.plainTextEdit.appendPlainText(msg)
-        self.update()
-
     def update_event_log(self, msg):
-        self.update_plain_text(f"{datetime.now()}:  {msg}")
+        self._log.append(msg)
 
     def update(self):
         if self._watch is None:
@@ -164,6 +262,9 @@ class MainWindow(QtWidgets.QMainWindow):
         if self._watch.isRunning():
             self._watch.stop()
             self._watch.wait()
+        Settings.shared("config.ini").unwatch()
+        close_notifications()
+        self._log.close()
         super().closeEvent(event)
 
 
@@ -172,7 +273,7 @@ class SettingWindow(QtWidgets.QWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        loadUi("settings.ui", self)
+        load_form("settings.ui", self)
         self.setWindowTitle("Settings")
 
         self.times = [TimeEdit(self) for _ in range(3)]
@@ -215,10 +316,13 @@ class SettingWindow(QtWidgets.QWidget):
         super().update()
 
     def load(self):
-        settings = Settings("config.ini")
+        settings = Settings.shared("config.ini")
 
         for opt in settings.get_values().keys():
-            item = self._settings[opt]
+            item = self._settings.get(opt)
+            if item is None:
+                continue
+
             match type(item):
                 case QtWidgets.QLineEdit:
                     item.setText(settings.get(opt))
@@ -239,7 +343,7 @@ class SettingWindow(QtWidgets.QWidget):
                                 i.setTime(t)
 
     def save(self):
-        settings = Settings("config.ini")
+        settings = Settings.shared("config.ini")
 
         values = {}
 
@@ -292,10 +396,69 @@ class SettingWindow(QtWidgets.QWidget):
         self.update()
 
     def test_complete_sound(self):
-        alert.Alert("", audio_file=self.lineCompleteSound.text(), delay=0).start()
+        alert.Notification.AUDIO.play(self.lineCompleteSound.text())
 
     def test_alert_sound(self):
-        alert.Alert("", audio_file=self.lineAlertSound.text(), delay=0).start()
+        alert.Notification.AUDIO.play(self.lineAlertSound.text())
+
+
+class DiagnosticsWindow(QtWidgets.QWidget):
+    def __init__(self, parent=None, *, samples=None):
+        super().__init__(parent)
+        self._samples = samples
+        self.setWindowTitle("Diagnostics")
+        self.resize(640, 320)
+
+        self.text = QtWidgets.QPlainTextEdit(self)
+        self.text.setReadOnly(True)
+        self.text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+
+        self.enabled = QtWidgets.QCheckBox("Record", self)
+        self.enabled.setChecked(METRICS.enabled)
+        self.enabled.clicked.connect(self.set_enabled)
+
+        self.btnReset = QtWidgets.QPushButton("Reset", self)
+        self.btnReset.clicked.connect(self.reset)
+        self.btnDump = QtWidgets.QPushButton("Dump", self)
+        self.btnDump.clicked.connect(self.dump)
+
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(self.enabled)
+        buttons.addStretch()
+        buttons.addWidget(self.btnReset)
+        buttons.addWidget(self.btnDump)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.text)
+        layout.addLayout(buttons)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update)
+        self.timer.start(1000)
+
+        self.update()
+
+    def update(self):
+        text = METRICS.report()
+        samples = self._samples() if self._samples is not None else []
+        if samples:
+            text += "\n\nRecent samples\n"
+            text += "\n".join(f"{datetime.fromtimestamp(ts):%H:%M:%S}  [{name}] {sample.sample_id:<16} {state:<10} "
+                              f"{', '.join(sample.assays)}" for ts, name, sample, state in samples)
+        self.text.setPlainText(text)
+        super().update()
+
+    def set_enabled(self):
+        METRICS.enabled = self.enabled.isChecked()
+
+    def reset(self):
+        METRICS.reset()
+        self.update()
+
+    def dump(self):
+        file = QFileDialog.getSaveFileName(self, "Save Diagnostics", "./diagnostics.txt", "text file (*.txt)")[0]
+        if file != "":
+            METRICS.dump(file)
 
 
 class TimeEdit(QtWidgets.QWidget):
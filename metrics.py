@@ -0,0 +1,158 @@
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from time import monotonic
+
+BUCKETS = [0.001 * 2 ** i for i in range(16)]
+
+
+class Histogram:
+    """
+    Durations of one stage: counts in power-of-two buckets from 1 ms
+    and the `window` most recent values for percentiles
+    """
+
+    def __init__(self, window=1024):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def percentile(self, p):
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_stage", "_start")
+
+    def __init__(self, metrics, stage):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.record(self._stage, monotonic() - self._start)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Rolling latency histograms per pipeline stage, the current and peak
+    value of gauges such as queue depths, and the time each of the last
+    `max_traces` samples reached each stage. Nothing is recorded while
+    `enabled` is False.
+    """
+
+    def __init__(self, *, enabled=False, max_traces=200):
+        self.enabled = enabled
+        self._max_traces = max_traces
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._gauges = {}
+        self._traces = OrderedDict()
+
+    def stage(self, name):
+        """
+        Context manager recording the time spent in the block
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, name)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def gauge(self, name, value):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            peak = self._gauges.get(name, (0, value))[1]
+            self._gauges[name] = (value, max(peak, value))
+
+    def mark(self, sample_id, name):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            trace = self._traces.pop(sample_id, None)
+            if trace is None:
+                trace = []
+            trace.append((name, datetime.now()))
+            self._traces[sample_id] = trace
+            while len(self._traces) > self._max_traces:
+                self._traces.popitem(last=False)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._gauges = {}
+            self._traces = OrderedDict()
+
+    def report(self):
+        with self._lock:
+            lines = [f"{'stage':<16}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)"]
+            for name in sorted(self._histograms):
+                h = self._histograms[name]
+                lines.append(f"{name:<16}{h.total:>8}{h.sum / h.total * 1e3:>10.1f}{h.percentile(50) * 1e3:>10.1f}"
+                             f"{h.percentile(95) * 1e3:>10.1f}{h.percentile(99) * 1e3:>10.1f}")
+
+            if self._gauges:
+                lines.append("")
+                lines.append(f"{'gauge':<16}{'current':>8}{'peak':>10}")
+                for name in sorted(self._gauges):
+                    current, peak = self._gauges[name]
+                    lines.append(f"{name:<16}{current:>8}{peak:>10}")
+        return "\n".join(lines)
+
+    def dump(self, f_name):
+        with self._lock:
+            histograms = {name: list(h.counts) for name, h in self._histograms.items()}
+            traces = list(self._traces.items())
+
+        with open(f_name, "w") as f:
+            f.write(f"{datetime.now()}\n\n{self.report()}\n\n")
+
+            bounds = [f"<={b * 1e3:g}ms" for b in BUCKETS] + ["more"]
+            f.write("stage," + ",".join(bounds) + "\n")
+            for name, counts in sorted(histograms.items()):
+                f.write(f"{name}," + ",".join(str(c) for c in counts) + "\n")
+
+            f.write("\n")
+            for sample_id, trace in traces:
+                f.write(f"{sample_id}: " + ", ".join(f"{name} {t.time()}" for name, t in trace) + "\n")
+
+
+METRICS = Metrics()
@@ -0,0 +1,177 @@
+import os
+from time import monotonic
+
+from watchdog.events import (DirCreatedEvent, DirDeletedEvent, FileCreatedEvent, FileDeletedEvent,
+                             FileModifiedEvent, FileMovedEvent)
+from watchdog.observers.api import EventEmitter
+
+
+class ScandirEmitter(EventEmitter):
+    """
+    Polling emitter for folders where native change notifications are
+    unreliable, such as network shares.
+
+    Every entry is cached with its (inode, mtime, size). A scan stats each
+    directory and only lists the directories whose mtime changed, plus
+    re-stats files created or modified in the last `hot_time` seconds.
+    Older files rewritten in place without touching their directory are
+    caught by a full scan every `full_scan_every` scans. The interval drops to
+    `min_interval` when a scan finds changes and doubles up to
+    `max_interval` while the folder stays idle.
+    """
+
+    def __init__(self, event_queue, watch, timeout=1, *, min_interval=0.5, max_interval=10.0, full_scan_every=30,
+                 hot_time=60.0):
+        super().__init__(event_queue, watch, timeout)
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._full_scan_every = full_scan_every
+        self._hot_time = hot_time
+        self._interval = min_interval
+        self._scans = 0
+        self._dirs = None
+        self._hot = {}
+
+    def on_thread_start(self):
+        self._dirs = {}
+        self.scan(full=True)
+
+    def queue_events(self, timeout):
+        if self.stopped_event.wait(self._interval):
+            return
+
+        self._scans += 1
+        changed = self.scan(full=self._scans % self._full_scan_every == 0)
+
+        if changed:
+            self._interval = self._min_interval
+        else:
+            self._interval = min(self._interval * 2, self._max_interval)
+
+    def scan(self, *, full=False):
+        """
+        Queue the changes since the previous scan and return how many were found
+        """
+        first = not self._dirs
+        created, deleted, events = {}, {}, []
+        visited = set()
+        stack = [self.watch.path]
+
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+
+            visited.add(path)
+            old = self._dirs.get(path)
+            if old is not None and old[0] == mtime and not full:
+                entries = old[1]
+            else:
+                entries = self._list(path)
+                self._dirs[path] = (mtime, entries)
+                if not first:
+                    self._diff(path, {} if old is None else old[1], entries, created, deleted, events)
+
+            if self.watch.is_recursive:
+                stack.extend(os.path.join(path, name) for name, entry in entries.items() if entry[3])
+
+        for path in list(self._dirs):
+            if path not in visited:
+                del self._dirs[path]
+
+        self._check_hot(created, events)
+
+        for inode, src_path in deleted.items():
+            dest_path = created.pop(inode, None)
+            if dest_path is None:
+                events.append(FileDeletedEvent(src_path))
+            else:
+                events.append(FileMovedEvent(src_path, dest_path))
+
+        for dest_path in created.values():
+            events.append(FileCreatedEvent(dest_path))
+
+        for event in events:
+            self.queue_event(event)
+
+        return len(events)
+
+    @staticmethod
+    def _list(path):
+        entries = {}
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    entries[entry.name] = (stat.st_ino, stat.st_mtime_ns, stat.st_size, is_dir)
+        except OSError:
+            pass
+
+        return entries
+
+    def _diff(self, path, old, new, created, deleted, events):
+        for name, entry in old.items():
+            if name not in new:
+                full_path = os.path.join(path, name)
+                if entry[3]:
+                    events.append(DirDeletedEvent(full_path))
+                elif entry[0]:
+                    deleted[entry[0]] = full_path
+                else:
+                    events.append(FileDeletedEvent(full_path))
+
+        for name, entry in new.items():
+            full_path = os.path.join(path, name)
+            before = old.get(name)
+
+            if entry[3]:
+                if before is None:
+                    events.append(DirCreatedEvent(full_path))
+                continue
+
+            if before is None:
+                if entry[0]:
+                    created[entry[0]] = full_path
+                else:
+                    events.append(FileCreatedEvent(full_path))
+                self._hot[full_path] = (entry, monotonic() + self._hot_time)
+            elif before[1:3] != entry[1:3]:
+                events.append(FileModifiedEvent(full_path))
+                self._hot[full_path] = (entry, monotonic() + self._hot_time)
+
+    def _check_hot(self, created, events):
+        """
+        Re-stat files that changed in the last `hot_time` seconds, as
+        writes to an existing file don't change the mtime of its directory
+        """
+        fresh = set(created.values()) | {e.src_path for e in events if isinstance(e, FileModifiedEvent)}
+        now = monotonic()
+
+        for path, (entry, expires) in list(self._hot.items()):
+            if path in fresh:
+                continue
+
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._hot[path]
+                continue
+
+            current = (stat.st_ino, stat.st_mtime_ns, stat.st_size, False)
+            if current[1:3] == entry[1:3]:
+                if now >= expires:
+                    del self._hot[path]
+                continue
+
+            self._hot[path] = (current, now + self._hot_time)
+            events.append(FileModifiedEvent(path))
+
+            cached = self._dirs.get(os.path.dirname(path))
+            if cached is not None and os.path.basename(path) in cached[1]:
+                cached[1][os.path.basename(path)] = current
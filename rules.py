@@ -0,0 +1,123 @@
+import fnmatch
+import re
+
+
+class Rule:
+    """
+    What to do when a received sample has an assay matching `pattern`
+    """
+
+    __slots__ = ("pattern", "sound", "delay", "cancel_on_confirm", "priority")
+
+    def __init__(self, pattern, *, sound=None, delay=60, cancel_on_confirm=True, priority=0):
+        self.pattern = pattern
+        self.sound = sound
+        self.delay = delay
+        self.cancel_on_confirm = cancel_on_confirm
+        self.priority = priority
+
+    def __repr__(self):
+        return f"Rule({self.pattern!r}, delay={self.delay}, priority={self.priority})"
+
+
+def is_pattern(code):
+    return any(c in code for c in "*?[")
+
+
+class RuleTable:
+    """
+    Rules compiled for lookup: exact assay codes in a dict, and wildcard
+    patterns matched once per assay code and then remembered, so matching
+    costs a dict lookup per assay however many rules there are.
+    """
+
+    MAX_CACHE = 4096
+
+    def __init__(self, rules):
+        self._exact = {}
+        self._patterns = []
+        self._cache = {}
+
+        for rule in rules:
+            if is_pattern(rule.pattern):
+                self._patterns.append((re.compile(fnmatch.translate(rule.pattern)), rule))
+            elif self._better(rule, self._exact.get(rule.pattern)):
+                self._exact[rule.pattern] = rule
+
+    @staticmethod
+    def _better(rule, other):
+        return other is None or rule.priority > other.priority
+
+    def lookup(self, code):
+        if not self._patterns:
+            return self._exact.get(code)
+
+        try:
+            return self._cache[code]
+        except KeyError:
+            pass
+
+        rule = self._exact.get(code)
+        for regex, candidate in self._patterns:
+            if regex.match(code) and self._better(candidate, rule):
+                rule = candidate
+
+        if len(self._cache) >= self.MAX_CACHE:
+            self._cache.clear()
+        self._cache[code] = rule
+        return rule
+
+    def match(self, assays):
+        """
+        Return the highest priority rule matching any of `assays`, or None
+        """
+        best = None
+        for code in assays:
+            rule = self.lookup(code)
+            if rule is not None and self._better(rule, best):
+                best = rule
+
+        return best
+
+
+class RuleEngine:
+    """
+    Assay rules that can be replaced while the handlers are running.
+    `load` builds a new table and swaps it in with a single assignment,
+    so a match always sees either the old rules or the new ones.
+    """
+
+    def __init__(self, rules=()):
+        self._table = RuleTable(rules)
+
+    def load(self, rules):
+        self._table = RuleTable(rules)
+
+    def match(self, assays):
+        return self._table.match(assays)
+
+    @staticmethod
+    def parse(text, *, sound=None, delay=60):
+        """
+        Read rules written as `pattern[,key=value...]` separated by `;`,
+        for example "PR15B;AB*,delay=30,sound=audio/ab.mp3,cancel=0,priority=5".
+        `sound` and `delay` are the defaults of rules that don't set them.
+        """
+        rules = []
+        for entry in text.split(";"):
+            parts = [p.strip() for p in entry.split(",")]
+            if not parts[0]:
+                continue
+
+            options = {}
+            for part in parts[1:]:
+                key, _, value = part.partition("=")
+                options[key.strip()] = value.strip()
+
+            rules.append(Rule(parts[0],
+                              sound=options.get("sound", sound),
+                              delay=int(options.get("delay", delay)),
+                              cancel_on_confirm=bool(int(options.get("cancel", 1))),
+                              priority=int(options.get("priority", 0))))
+
+        return rules
@@ -0,0 +1,123 @@
+import heapq
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+
+class Job:
+    """
+    A callback waiting in a Scheduler
+    """
+
+    __slots__ = ("deadline", "callback", "cancelled", "_seq")
+
+    def __init__(self, deadline, callback, seq):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+        self._seq = seq
+
+    def __lt__(self, other):
+        return (self.deadline, self._seq) < (other.deadline, other._seq)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    Run callbacks after a delay, using one timer thread for all pending jobs.
+
+    Jobs are kept in a heap ordered by deadline, so scheduling is O(log n)
+    and cancelling is O(1) (cancelled jobs are dropped when they reach the top).
+    The timer thread sleeps until the next deadline instead of polling,
+    and hands due callbacks to a small worker pool.
+    """
+
+    def __init__(self, *, workers=4, name="scheduler"):
+        self._heap = []
+        self._cond = threading.Condition()
+        self._counter = itertools.count()
+        self._workers = workers
+        self._name = name
+        self._executor = None
+        self._thread = None
+        self._closed = False
+
+    def schedule(self, delay, callback):
+        job = Job(monotonic() + max(delay, 0), callback, next(self._counter))
+
+        with self._cond:
+            self._ensure_started()
+            heapq.heappush(self._heap, job)
+            if self._heap[0] is job:
+                self._cond.notify()
+
+        return job
+
+    def cancel(self, job):
+        job.cancel()
+
+    def submit(self, fn, *args):
+        with self._cond:
+            self._ensure_started()
+        return self._executor.submit(fn, *args)
+
+    def pending(self):
+        with self._cond:
+            return sum(1 for job in self._heap if not job.cancelled)
+
+    def shutdown(self, *, wait=False):
+        """
+        Drop the pending jobs and stop the timer thread and the workers,
+        waiting for the jobs already firing when `wait` is true
+        """
+        with self._cond:
+            self._closed = True
+            self._heap.clear()
+            self._cond.notify()
+            executor = self._executor
+
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix=f"{self._name}-worker")
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+
+                job = self._heap[0]
+                if job.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+
+                timeout = job.deadline - monotonic()
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+
+                heapq.heappop(self._heap)
+
+            self._executor.submit(self._fire, job)
+
+    @staticmethod
+    def _fire(job):
+        if job.cancelled:
+            return
+
+        try:
+            job.callback()
+        except Exception as e:
+            print(e)
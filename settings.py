@@ -1,10 +1,31 @@
+import os
+import threading
 from configparser import ConfigParser
 from os import path
 
+from signals import Signal
+
+
+INSTRUMENT_PREFIX = "instrument:"
+INSTRUMENT_OPTIONS = ("ih_folder", "lis_folder", "complete_sound", "alert_sound", "alert_wait", "alert_rules")
+
 
 class Settings:
+    """
+    Options of `config.ini`. `shared` returns one instance per file, which
+    emits CHANGED with the names of the changed options, plus "instruments"
+    when an instrument section changed, whenever `update` or `reload`
+    changes a value. `watch` reloads the file when it is edited on disk.
+    """
+
+    CHANGED = Signal(set)
+    SHARED = {}
+    SHARED_LOCK = threading.Lock()
+
     def __init__(self, f_name):
         self._f_name = f_name
+        self._lock = threading.RLock()
+        self._observer = None
         self._config = ConfigParser()
         self._config.add_section("setting")
         self._init_values = {
@@ -13,14 +34,50 @@ class Settings:
             "complete_sound": "audio/complete.mp3",
             "alert_sound": "audio/alert.mp3",
             "alert_wait": "60",
+            "alert_rules": "PR15B",
             "termination_time": "0:0,0:0,0:0",
             "termination_enable": "0,0,0",
+            "lis_command": "AutomationNet.exe",
+            "lis_workdir": r"c:\automation",
+            "lis_window": "1",
+            "lis_bridge": "",
+            "lis_timeout": "60",
+            "debounce_quiet": "0.5",
+            "debounce_expiry": "10",
+            "journal_file": "journal.db",
+            "metrics_enabled": "0",
+            "polling": "0",
+            "poll_interval": "0.5",
+            "poll_max_interval": "10",
+            "log_max_lines": "5000",
+            "log_interval": "250",
+            "log_file": "events.log",
+            "log_max_bytes": "1000000",
+            "log_backups": "5",
+            "watch_config": "1",
+            "announce_max_age": "300",
+            "announce_summary": "5",
+            "history_size": "1000",
+            "history_age": "86400",
+            "catchup_max_age": "600",
+            "catchup_workers": "4",
+            "catchup_processes": "0",
+            "worker_threads": "4",
+            "worker_queue": "1000",
         }
         self._options = self._init_values.keys()
 
-        self.reset()
+        self._config.read_dict({"setting": self._init_values})
         self.load()
 
+    @classmethod
+    def shared(cls, f_name="config.ini"):
+        with cls.SHARED_LOCK:
+            settings = cls.SHARED.get(f_name)
+            if settings is None:
+                settings = cls.SHARED[f_name] = cls(f_name)
+            return settings
+
     def reset(self) -> None:
         self.update(self._init_values)
 
@@ -28,29 +85,124 @@ class Settings:
         if not path.isfile(self._f_name):
             return
 
-        self._config.read(self._f_name)
+        with self._lock:
+            self._config.read(self._f_name)
+
+    def reload(self) -> None:
+        """
+        Read the file again and emit CHANGED if any value differs
+        """
+        config = ConfigParser()
+        config.read_dict({"setting": self._init_values})
+        try:
+            config.read(self._f_name)
+        except Exception as e:
+            print(e)
+            return
+
+        with self._lock:
+            before = self._snapshot()
+            self._config = config
+            changed = self._changes(before)
+
+        if changed:
+            self.CHANGED.emit(changed)
 
     def update(self, value_dict: dict) -> None:
-        for opt in self._options:
-            if value_dict.get(opt) is None:
-                continue
+        with self._lock:
+            before = self._snapshot()
+            for opt in self._options:
+                if value_dict.get(opt) is None:
+                    continue
 
-            self._config.set("setting", opt, value_dict[opt])
+                self._config.set("setting", opt, value_dict[opt])
+            changed = self._changes(before)
+
+        if changed:
+            self.CHANGED.emit(changed)
 
     def save(self) -> None:
-        with open(self._f_name, "w") as f:
-            self._config.write(f)
+        # replace the file in one step, so a watcher never reads it half written
+        tmp = f"{self._f_name}.tmp"
+        with self._lock:
+            with open(tmp, "w") as f:
+                self._config.write(f)
+            os.replace(tmp, self._f_name)
 
     def get(self, opt: str) -> str:
-        return self._config.get("setting", opt)
+        with self._lock:
+            return self._config.get("setting", opt)
 
     def get_values(self) -> dict:
         value_dict = {}
-        for opt in self._options:
-            value_dict[opt] = self._config.get("setting", opt)
+        with self._lock:
+            for opt in self._options:
+                value_dict[opt] = self._config.get("setting", opt)
 
         return value_dict
 
+    def _snapshot(self):
+        return self.get_values(), self.get_instruments()
+
+    def _changes(self, before):
+        values, instruments = self._snapshot()
+        changed = {opt for opt, value in values.items() if before[0].get(opt) != value}
+        if instruments != before[1]:
+            changed.add("instruments")
+        return changed
+
+    def watch(self) -> None:
+        """
+        Reload the settings whenever the file is written
+        """
+        if self._observer is not None:
+            return
+
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        settings = self
+        f_name = path.abspath(self._f_name)
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if f_name in (path.abspath(event.src_path), path.abspath(getattr(event, "dest_path", "") or "")):
+                    settings.reload()
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), path.dirname(f_name), False)
+        self._observer.daemon = True
+        self._observer.start()
+
+    def unwatch(self) -> None:
+        if self._observer is None:
+            return
+
+        self._observer.stop()
+        self._observer.join()
+        self._observer = None
+
+    def get_instruments(self) -> list[dict]:
+        """
+        Folders, sounds and delay of every instrument. Each `[instrument:<name>]`
+        section adds an instrument, taking missing options from `[setting]`,
+        whose own folders form the instrument "IH".
+        """
+        instruments = []
+        with self._lock:
+            sections = [s for s in self._config.sections() if s.startswith(INSTRUMENT_PREFIX)]
+
+            if not sections or self.get("ih_folder") or self.get("lis_folder"):
+                instruments.append({"name": "IH", **{opt: self.get(opt) for opt in INSTRUMENT_OPTIONS}})
+
+            for section in sections:
+                instrument = {"name": section[len(INSTRUMENT_PREFIX):].strip()}
+                for opt in INSTRUMENT_OPTIONS:
+                    instrument[opt] = self._config.get(section, opt, fallback=self.get(opt))
+                instruments.append(instrument)
+
+        return instruments
+
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,50 @@
+import threading
+
+
+class BoundSignal:
+    """
+    Slots connected to a signal of one object
+    """
+
+    def __init__(self):
+        self._slots = ()
+        self._lock = threading.Lock()
+
+    def connect(self, slot):
+        with self._lock:
+            self._slots = self._slots + (slot,)
+
+    def disconnect(self, slot):
+        with self._lock:
+            self._slots = tuple(s for s in self._slots if s != slot)
+
+    def emit(self, *args):
+        for slot in self._slots:
+            try:
+                slot(*args)
+            except Exception as e:
+                print(e)
+
+
+class Signal:
+    """
+    Qt-like signal for plain Python objects, so the folder handlers don't
+    need a QObject. Declared on the class, connected and emitted per
+    instance, and slots are called directly on the emitting thread.
+    """
+
+    def __init__(self, *types):
+        self._types = types
+        self._name = None
+
+    def __set_name__(self, owner, name):
+        self._name = f"_signal_{name}"
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        bound = instance.__dict__.get(self._name)
+        if bound is None:
+            bound = instance.__dict__.setdefault(self._name, BoundSignal())
+        return bound
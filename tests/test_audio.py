@@ -0,0 +1,102 @@
+from time import sleep
+
+from announcer import ALERT, Announcer
+from audio import AudioEngine, NullSink
+
+
+class CountingSink(NullSink):
+    def __init__(self, *, duration=0.0):
+        super().__init__(duration=duration)
+        self.loaded = []
+
+    def load(self, file):
+        self.loaded.append(file)
+        return file
+
+
+def clips(tmp_path, *names):
+    files = []
+    for name in names:
+        file = tmp_path / f"{name}.mp3"
+        file.write_text(name)
+        files.append(str(file))
+    return files
+
+
+def played(sink, tmp_path):
+    return [clip[len(str(tmp_path)) + 1:-len(".mp3")] for _, clip in sink.played]
+
+
+def test_clips_are_played_in_order_and_loaded_once(tmp_path):
+    a, b = clips(tmp_path, "a", "b")
+    sink = CountingSink()
+    audio = AudioEngine(sink)
+
+    for file in (a, b, a):
+        done = audio.play(file)
+    assert done.wait(5)
+
+    assert played(sink, tmp_path) == ["a", "b", "a"]
+    assert sink.loaded == [a, b]
+
+
+def test_alert_is_played_before_waiting_completions(tmp_path):
+    chime, c1, c2, c3, alert = clips(tmp_path, "chime", "c1", "c2", "c3", "alert")
+    sink = NullSink(duration=0.2)
+    announcer = Announcer(AudioEngine(sink))
+
+    announcer.announce("C1", c1, chime=chime)
+    sleep(0.1)
+    announcer.announce("C2", c2, chime=chime)
+    announcer.announce("C3", c3, chime=chime)
+    done = announcer.announce("A", alert, priority=ALERT)
+    assert done.wait(5)
+    sleep(0.1)
+    assert announcer.announce("C4", None).wait(5)
+
+    assert played(sink, tmp_path) == ["chime", "c1", "alert", "c2", "c3"]
+
+
+def test_waiting_completions_are_summarized(tmp_path):
+    c1, c2, c3, c4, summary = clips(tmp_path, "c1", "c2", "c3", "c4", "summary")
+    sink = NullSink(duration=0.2)
+    names = []
+    announcer = Announcer(AudioEngine(sink), summarize=lambda n: names.extend(n) or summary, summary_threshold=2)
+
+    announcer.announce("C1", c1)
+    sleep(0.1)
+    announcer.announce("C2", c2)
+    announcer.announce("C3", c3)
+    done = announcer.announce("C4", c4)
+    assert done.wait(5)
+
+    assert played(sink, tmp_path) == ["c1", "summary"]
+    assert names == ["C2", "C3", "C4"]
+    assert announcer.merged == 3
+
+
+def test_old_completions_are_dropped(tmp_path):
+    c1, c2 = clips(tmp_path, "c1", "c2")
+    sink = NullSink(duration=0.3)
+    announcer = Announcer(AudioEngine(sink), max_age=0.1)
+
+    announcer.announce("C1", c1)
+    sleep(0.05)
+    assert announcer.announce("C2", c2).wait(5)
+
+    assert played(sink, tmp_path) == ["c1"]
+    assert announcer.dropped == 1
+
+
+def test_chime_is_played_while_the_summary_is_not_ready(tmp_path):
+    chime, c1, c2, c3, c4 = clips(tmp_path, "chime", "c1", "c2", "c3", "c4")
+    sink = NullSink(duration=0.2)
+    announcer = Announcer(AudioEngine(sink), summarize=lambda names: None, summary_threshold=2)
+
+    announcer.announce("C1", c1, chime=chime)
+    sleep(0.1)
+    announcer.announce("C2", c2, chime=chime)
+    announcer.announce("C3", c3, chime=chime)
+    assert announcer.announce("C4", c4, chime=chime).wait(5)
+
+    assert played(sink, tmp_path) == ["chime", "c1", "chime"]
@@ -0,0 +1,44 @@
+from time import sleep
+
+from debounce import Debouncer
+from scheduler import Scheduler
+from workers import OrderedPool
+
+
+def test_flush_dispatches_paths_in_their_quiet_period(tmp_path):
+    timer = Scheduler(workers=1)
+    pool = OrderedPool(workers=1)
+    debouncer = Debouncer(timer, executor=pool, quiet=60)
+    dispatched = []
+
+    for name in ("a.upl", "b.upl", "a.upl"):
+        path = str(tmp_path / name)
+        debouncer.submit(path, lambda path=path: dispatched.append(path))
+    assert debouncer.stats()["pending"] == 2
+
+    debouncer.flush()
+    timer.shutdown(wait=True)
+    pool.shutdown()
+
+    assert dispatched == [str(tmp_path / "b.upl"), str(tmp_path / "a.upl")]
+    assert debouncer.stats()["pending"] == 0
+    assert debouncer.stats()["suppressed"] == 1
+
+
+def test_deletes_are_collapsed_within_the_quiet_period(tmp_path):
+    timer = Scheduler(workers=1)
+    pool = OrderedPool(workers=1)
+    debouncer = Debouncer(timer, executor=pool, quiet=0.1)
+    dispatched = []
+    path = str(tmp_path / "S1.xml")
+
+    for _ in range(3):
+        debouncer.submit(path, lambda: dispatched.append(path))
+    sleep(0.3)
+    debouncer.submit(path, lambda: dispatched.append(path))
+    sleep(0.3)
+    timer.shutdown(wait=True)
+    pool.shutdown()
+
+    assert dispatched == [path, path]
+    assert debouncer.stats()["suppressed"] == 2
@@ -0,0 +1,61 @@
+import sqlite3
+import threading
+
+from alert import IhFolderHandler, Notification
+from journal import Journal, RECEIVED, COMPLETED
+from rules import Rule, RuleEngine
+from scheduler import Scheduler
+
+
+def journal_threads():
+    return [t for t in threading.enumerate() if t.name == "journal"]
+
+
+def test_close_writes_and_stops_the_writer(tmp_path):
+    journal = Journal(str(tmp_path / "journal.db"))
+    journal.record("S1", RECEIVED, deadline=100.0, sound="alert.mp3")
+    journal.record("S2", RECEIVED)
+    journal.record("S2", COMPLETED)
+    journal.close()
+
+    assert not journal_threads()
+    assert journal.pending() == {"S1": (100.0, "alert.mp3")}
+
+
+def test_record_after_close_starts_a_new_writer(tmp_path):
+    journal = Journal(str(tmp_path / "journal.db"))
+    journal.record("S1", RECEIVED)
+    journal.close()
+    journal.record("S2", RECEIVED)
+    journal.close()
+
+    assert not journal_threads()
+    assert journal.pending() == {"S1": (None, None), "S2": (None, None)}
+
+
+def test_journal_without_sounds_is_migrated(tmp_path):
+    f_name = str(tmp_path / "journal.db")
+    conn = sqlite3.connect(f_name)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, ts REAL, sample_id TEXT, state TEXT, deadline REAL)")
+    conn.execute("INSERT INTO events (ts, sample_id, state, deadline) VALUES (0, 'S1', ?, 100.0)", (RECEIVED,))
+    conn.commit()
+    conn.close()
+
+    assert Journal(f_name).pending() == {"S1": (100.0, None)}
+
+
+def test_restored_alert_keeps_the_sound_of_its_rule(tmp_path, monkeypatch):
+    monkeypatch.setattr(Notification, "SCHEDULER", Scheduler())
+    journal = Journal(str(tmp_path / "journal.db"))
+    rules = RuleEngine([Rule("PR15B", sound="pr15b.mp3", delay=60)])
+    handler = IhFolderHandler(audio_file="alert.mp3", journal=journal, rules=rules)
+    handler.start_alert("S1", 60, "pr15b.mp3")
+    handler.stop_notifications()
+    journal.close()
+
+    restored = IhFolderHandler(audio_file="alert.mp3", journal=journal, rules=rules)
+    restored.restore()
+
+    assert restored._notifications["S1"]._sound == "pr15b.mp3"
+    restored.stop_notifications()
+    journal.close()
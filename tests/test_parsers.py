@@ -0,0 +1,36 @@
+from alert import SampleTest
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def test_upload_with_several_patients(tmp_path):
+    path = write(tmp_path, "multi.upl",
+                 "H|\\^&|||IH-COM\n"
+                 "P|1||S1\nO|1|S1||^^^ABO\\^^^RH\n"
+                 "P|2||S2\nO|1|S2||^^^PR15B\n"
+                 "L|1|N\n")
+
+    assert list(SampleTest.iter_upl(path)) == [SampleTest("S1", ["ABO", "RH"]), SampleTest("S2", ["PR15B"])]
+
+
+def test_upload_delimiters_from_header(tmp_path):
+    path = write(tmp_path, "delimiters.upl",
+                 "H!@#$!!!IH-COM\n"
+                 "P!1!!S1\nO!1!S1!!###ABO@###RH\n"
+                 "L!1!N\n")
+
+    assert list(SampleTest.iter_upl(path)) == [SampleTest("S1", ["ABO", "RH"])]
+
+
+def test_upload_frame_numbers(tmp_path):
+    path = write(tmp_path, "frames.upl",
+                 "1H|\\^&|||IH-COM\r\n"
+                 "2P|1||S1\r\n3O|1|S1||^^^DAT\r\n"
+                 "4L|1|N\r\n")
+
+    assert list(SampleTest.iter_upl(path)) == [SampleTest("S1", ["DAT"])]
+
@@ -0,0 +1,44 @@
+import queue
+
+from watchdog.events import FileCreatedEvent, FileModifiedEvent
+from watchdog.observers.api import ObservedWatch
+
+from polling import ScandirEmitter
+
+
+def events(event_queue):
+    found = []
+    while not event_queue.empty():
+        event, _ = event_queue.get()
+        found.append((type(event), event.src_path))
+    return found
+
+
+def test_append_after_an_unchanged_scan_is_seen(tmp_path):
+    event_queue = queue.Queue()
+    emitter = ScandirEmitter(event_queue, ObservedWatch(str(tmp_path), True))
+    emitter.on_thread_start()
+
+    upload = tmp_path / "S1.upl"
+    upload.write_text("H|\\^&\n")
+    emitter.scan()
+    assert events(event_queue) == [(FileCreatedEvent, str(upload))]
+
+    emitter.scan()
+    assert events(event_queue) == []
+
+    with open(upload, "a") as f:
+        f.write("P|1||S1\n")
+    emitter.scan()
+    assert events(event_queue) == [(FileModifiedEvent, str(upload))]
+
+
+def test_files_leave_the_hot_set_after_hot_time(tmp_path):
+    emitter = ScandirEmitter(queue.Queue(), ObservedWatch(str(tmp_path), True), hot_time=0)
+    emitter.on_thread_start()
+
+    (tmp_path / "S1.upl").write_text("H|\\^&\n")
+    emitter.scan()
+    emitter.scan()
+
+    assert not emitter._hot
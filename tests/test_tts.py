@@ -0,0 +1,112 @@
+import threading
+from time import monotonic, sleep
+
+from alert import Alert, Notification, summary_clip, summary_phrase
+from announcer import Announcer
+from audio import AudioEngine, NullSink
+from scheduler import Scheduler
+from tts import PhraseCache
+
+
+class FakeEngine:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.saved = []
+
+    def save(self, text, file):
+        sleep(self.delay)
+        self.saved.append(text)
+        with open(file, "w") as f:
+            f.write(text)
+
+
+class FailingEngine:
+    def save(self, text, file):
+        raise OSError("no network")
+
+
+def test_phrase_is_synthesized_once(tmp_path):
+    engine = FakeEngine()
+    cache = PhraseCache(str(tmp_path), engine=engine)
+
+    first = cache.get("123", "1 2 3")
+    assert cache.get("123", "1 2 3") == first
+    assert engine.saved == ["1 2 3"]
+    assert "123" in cache
+
+
+def test_request_of_cached_phrase_is_done(tmp_path):
+    cache = PhraseCache(str(tmp_path), engine=FakeEngine())
+    cache.get("123", "1 2 3")
+
+    assert cache.request("123", "1 2 3").done()
+
+
+def test_prefetch_shares_the_pending_synthesis(tmp_path):
+    engine = FakeEngine(delay=0.2)
+    cache = PhraseCache(str(tmp_path), engine=engine)
+
+    future = cache.prefetch("123", "1 2 3")
+    assert cache.request("123", "1 2 3") is future
+    future.result(5)
+    assert engine.saved == ["1 2 3"]
+
+
+def test_oldest_phrases_are_evicted(tmp_path):
+    cache = PhraseCache(str(tmp_path), engine=FakeEngine(), max_files=2)
+    for key in ("1", "2", "3"):
+        cache.get(key, key)
+
+    assert "1" not in cache
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["2.mp3", "3.mp3"]
+
+
+def test_failed_synthesis_is_raised(tmp_path):
+    cache = PhraseCache(str(tmp_path), engine=FailingEngine())
+
+    future = cache.request("123", "1 2 3")
+    assert isinstance(future.exception(5), OSError)
+    assert "123" not in cache
+
+
+def test_synthesis_does_not_hold_back_alerts(tmp_path, monkeypatch):
+    chime = tmp_path / "chime.mp3"
+    chime.write_text("chime")
+    sink = NullSink()
+    audio = AudioEngine(sink)
+    monkeypatch.setattr(Notification, "SCHEDULER", Scheduler(workers=4))
+    monkeypatch.setattr(Notification, "SEND_TO_LIS", False)
+    monkeypatch.setattr(Notification, "TTS", PhraseCache(str(tmp_path / "out"), engine=FakeEngine(delay=1.0)))
+    monkeypatch.setattr(Notification, "ANNOUNCER", Announcer(audio))
+
+    for i in range(4):
+        Notification(f"S00{i}", audio_file=str(chime)).start()
+
+    fired = threading.Event()
+    monkeypatch.setattr(Alert, "on_notify", lambda self: fired.set())
+    started = monotonic()
+    Alert("S100", delay=0.1).start()
+
+    assert fired.wait(5)
+    assert monotonic() - started < 0.5
+
+    # the completions are still announced, each after the chime as they
+    # are synthesized one at a time
+    deadline = monotonic() + 10
+    while len(sink.played) < 8 and monotonic() < deadline:
+        sleep(0.05)
+    clips = [clip for _, clip in sink.played]
+    assert clips[0] == str(chime)
+    assert len([clip for clip in clips if clip != str(chime)]) == 4
+
+
+def test_summary_clip_does_not_wait_for_synthesis(tmp_path, monkeypatch):
+    cache = PhraseCache(str(tmp_path), engine=FakeEngine(delay=0.5))
+    monkeypatch.setattr(Notification, "TTS", cache)
+
+    started = monotonic()
+    assert summary_clip(["S1", "S2"]) is None
+    assert monotonic() - started < 0.2
+
+    cache.request(*summary_phrase(["S1", "S2"])).result(5)
+    assert summary_clip(["S3", "S4"]) == str(tmp_path / "summary-2.mp3")
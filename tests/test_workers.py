@@ -0,0 +1,32 @@
+import threading
+from time import sleep
+
+from workers import Gate, OrderedPool
+
+
+def test_gated_tasks_commit_after_the_direct_ones():
+    pool = OrderedPool(workers=2)
+    gate = Gate(pool)
+    committed = []
+
+    gate.close()
+    live = threading.Thread(target=gate.submit, args=(lambda: lambda: committed.append("live"),))
+    live.start()
+    sleep(0.1)
+    for name in ("old 1", "old 2"):
+        pool.commit(committed.append, name)
+    gate.open()
+    live.join(5)
+    pool.shutdown()
+
+    assert committed == ["old 1", "old 2", "live"]
+
+
+def test_open_gate_passes_tasks_through():
+    pool = OrderedPool(workers=1)
+    committed = []
+
+    Gate(pool).submit(lambda: lambda: committed.append("live"))
+    pool.shutdown()
+
+    assert committed == ["live"]
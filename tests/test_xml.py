@@ -0,0 +1,27 @@
+from alert import SampleTest, XmlResult
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def test_result_with_sibling_element(tmp_path):
+    path = write(tmp_path, "sibling.xml",
+                 '<?xml version="1.0" encoding="UTF-8"?><RESULT>'
+                 "<Header><SampleBarcode>H</SampleBarcode></Header>"
+                 "<RESULT><SampleBarcode>S1</SampleBarcode><AssayCode>ABO</AssayCode>"
+                 "<AssayCode>PR15B</AssayCode></RESULT></RESULT>")
+
+    assert list(XmlResult.iter_file(path)) == [XmlResult({"SampleBarcode": "S1", "AssayCode": ["ABO", "PR15B"]})]
+    assert list(SampleTest.iter_xml(path)) == [SampleTest("S1", ["ABO", "PR15B"])]
+
+
+def test_result_with_header_without_barcode(tmp_path):
+    path = write(tmp_path, "header.xml",
+                 '<?xml version="1.0" encoding="UTF-8"?><RESULT>'
+                 "<Header><Operator>lab</Operator></Header>"
+                 "<RESULT><SampleBarcode>S1</SampleBarcode><AssayCode>ABO</AssayCode></RESULT></RESULT>")
+
+    assert list(SampleTest.iter_xml(path)) == [SampleTest("S1", ["ABO"])]
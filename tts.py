@@ -0,0 +1,172 @@
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class GttsEngine:
+    """
+    Synthesize phrases with Google Text-to-Speech
+    """
+
+    def __init__(self, *, lang="zh-tw", slow=True, timeout=10.0):
+        self._lang = lang
+        self._slow = slow
+        self._timeout = timeout
+
+    def save(self, text, file):
+        # gtts pulls in requests, so it's only imported once a phrase is synthesized
+        from gtts import gTTS
+
+        gTTS(text, lang=self._lang, slow=self._slow, timeout=self._timeout).save(file)
+
+
+class PhraseCache:
+    """
+    Synthesized phrases stored as mp3 files in `folder`.
+
+    The index of cached phrases is kept in memory in least recently used
+    order (restored from file modification times on start), and the oldest
+    files are removed once `max_files` or `max_bytes` is exceeded.
+    Phrases are synthesized one at a time on a daemon thread; `request`
+    returns a future so callers don't have to wait for it, and phrases
+    can be prefetched so they are ready before they have to be played.
+    """
+
+    def __init__(self, folder="audio/out/", *, engine=None, max_files=1000, max_bytes=None):
+        self._folder = folder
+        self._engine = engine or GttsEngine()
+        self._max_files = max_files
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = None
+        self._size = 0
+        self._pending = {}
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def set_engine(self, engine):
+        self._engine = engine
+
+    def get(self, key, text):
+        """
+        Return the audio file of the phrase, synthesizing it if necessary
+        """
+        return self.request(key, text).result()
+
+    def request(self, key, text):
+        """
+        Return a future of the audio file of the phrase, already done when
+        the phrase is cached
+        """
+        with self._lock:
+            self._load_index()
+            if key in self._index:
+                file = self._index[key][0]
+                if os.path.isfile(file):
+                    self._touch(key)
+                    future = Future()
+                    future.set_result(file)
+                    return future
+                self._size -= self._index.pop(key)[1]
+
+            return self._submit(key, text)
+
+    def prefetch(self, key, text):
+        with self._lock:
+            self._load_index()
+            if key in self._index:
+                return None
+
+            return self._submit(key, text)
+
+    def __contains__(self, key):
+        with self._lock:
+            self._load_index()
+            return key in self._index
+
+    def _file(self, key):
+        return os.path.join(self._folder, f"{key}.mp3")
+
+    def _submit(self, key, text):
+        future = self._pending.get(key)
+        if future is None:
+            future = self._pending[key] = Future()
+            if self._thread is None:
+                # a daemon, so a synthesis stuck on the network can't keep the process alive
+                self._thread = threading.Thread(target=self._run, name="tts", daemon=True)
+                self._thread.start()
+            self._queue.put((key, text, future))
+
+        return future
+
+    def _run(self):
+        while True:
+            key, text, future = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._synthesize(key, text))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _synthesize(self, key, text):
+        file = self._file(key)
+        tmp_file = f"{file}.tmp"
+
+        try:
+            self._engine.save(text, tmp_file)
+            os.replace(tmp_file, file)
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+        with self._lock:
+            self._add(key, file, os.path.getsize(file))
+            self._evict()
+
+        return file
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+
+        os.makedirs(self._folder, exist_ok=True)
+        entries = []
+        with os.scandir(self._folder) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".mp3"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-4], entry.path, stat.st_size))
+
+        self._index = OrderedDict()
+        for _, key, path, size in sorted(entries):
+            self._add(key, path, size)
+
+        self._evict()
+
+    def _add(self, key, file, size):
+        if key in self._index:
+            self._size -= self._index[key][1]
+
+        self._index[key] = (file, size)
+        self._index.move_to_end(key)
+        self._size += size
+
+    def _touch(self, key):
+        self._index.move_to_end(key)
+        try:
+            os.utime(self._index[key][0])
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._index and (len(self._index) > self._max_files or
+                               (self._max_bytes is not None and self._size > self._max_bytes)):
+            _, (file, size) = self._index.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(file)
+            except OSError as e:
+                print(e)
@@ -0,0 +1,126 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+from metrics import METRICS
+
+
+class OrderedPool:
+    """
+    Run tasks on `workers` threads and their results in submission order.
+
+    A task may return a callable, its commit step, which runs once the
+    commit steps of all earlier tasks have run, so files can be read and
+    parsed in parallel while the handlers still see them in event order.
+    At most `max_pending` tasks are queued or running; `submit` blocks
+    beyond that, which holds back the observer instead of letting the
+    queue grow. Queue depth and time blocked are recorded in METRICS as
+    "<name> queue" and "<name> blocked".
+    """
+
+    def __init__(self, *, workers=4, max_pending=1000, name="pool"):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._max_pending = max_pending
+        self._name = name
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._next = 0
+        self._done = {}
+        self._committing = False
+        self._closed = False
+        self.pending = 0
+        self.peak = 0
+        self.blocked = 0
+
+    def submit(self, fn, *args):
+        with self._cond:
+            if self.pending >= self._max_pending and not self._closed:
+                self.blocked += 1
+                waiting = monotonic()
+                while self.pending >= self._max_pending and not self._closed:
+                    self._cond.wait()
+                METRICS.record(f"{self._name} blocked", monotonic() - waiting)
+
+            if self._closed:
+                raise RuntimeError(f"{self._name} is shut down")
+
+            seq = self._seq
+            self._seq += 1
+            self.pending += 1
+            self.peak = max(self.peak, self.pending)
+            METRICS.gauge(f"{self._name} queue", self.pending)
+
+        self._executor.submit(self._work, seq, fn, args)
+
+    def commit(self, fn, *args):
+        """
+        Run `fn` in order with the commit steps of the other tasks
+        """
+        self.submit(functools.partial, fn, *args)
+
+    def stats(self):
+        with self._cond:
+            return {"queued": self.pending, "peak": self.peak, "blocked": self.blocked}
+
+    def shutdown(self):
+        # wake the callers blocked on a full queue, the tasks already queued still run
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._executor.shutdown()
+
+    def _work(self, seq, fn, args):
+        try:
+            result = fn(*args)
+        except Exception as e:
+            print(e)
+            result = None
+
+        with self._cond:
+            self._done[seq] = result
+            if self._committing:
+                return
+            self._committing = True
+
+        while True:
+            with self._cond:
+                if self._next not in self._done:
+                    self._committing = False
+                    return
+                step = self._done.pop(self._next)
+                self._next += 1
+
+            try:
+                if callable(step):
+                    step()
+            except Exception as e:
+                print(e)
+            finally:
+                with self._cond:
+                    self.pending -= 1
+                    METRICS.gauge(f"{self._name} queue", self.pending)
+                    self._cond.notify_all()
+
+
+class Gate:
+    """
+    Hold the tasks submitted through it until it is opened, then pass them
+    to `pool`. Tasks submitted to the pool directly in the meantime are
+    queued, and so committed, ahead of them.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._open = threading.Event()
+        self._open.set()
+
+    def close(self):
+        self._open.clear()
+
+    def open(self):
+        self._open.set()
+
+    def submit(self, fn, *args):
+        self._open.wait()
+        self._pool.submit(fn, *args)